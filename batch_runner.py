@@ -0,0 +1,190 @@
+"""Run many headless play sessions across generated levels in a process pool.
+
+    python batch_runner.py --episodes 2000 --levels 50 --policy random
+    python batch_runner.py --episodes 500 --scaling   # episodes/sec per worker count
+
+Every episode plays one generated level with one input policy until the
+player reaches the end of the level or --frames runs out. Workers write
+their results straight into a shared-memory NumPy array (one row per
+episode), so nothing but episode ranges is pickled between processes.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# One row per episode
+RESULT_DTYPE = np.dtype([
+    ("completed", np.int8),
+    ("deaths", np.int32),
+    ("frames", np.int32),
+    ("coin_blocks", np.int32),
+    ("max_x", np.int32),
+])
+
+POLICIES = ("right", "right_jump", "random")
+
+
+def policy_inputs(game, policy, rng, frame):
+    """Input bitmask for one frame of a policy, from game's (samsofthdr's) INPUT_* bits."""
+    if policy == "right":
+        return game.INPUT_RIGHT
+    if policy == "right_jump":
+        # Hold right, hop regularly
+        return game.INPUT_RIGHT | (game.INPUT_JUMP if frame % 30 < 12 else 0)
+    # random: mostly right, with jumps and the odd step back
+    return ((game.INPUT_RIGHT if rng.random() < 0.85 else game.INPUT_LEFT)
+            | (game.INPUT_JUMP if rng.random() < 0.25 else 0))
+
+
+# --- Worker side ---
+_worker = {}
+
+
+def _init_worker(shm_name, count, width, frames, policy, levels_dir):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import samsofthdr
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker.update(
+        game=samsofthdr,
+        shm=shm, # keep the mapping alive
+        results=np.ndarray((count,), dtype=RESULT_DTYPE, buffer=shm.buf),
+        width=width, frames=frames, policy=policy, levels_dir=levels_dir,
+    )
+
+
+def level_path(levels_dir, width, seed):
+    return os.path.join(levels_dir, "level_%d_%d.lvl" % (width, seed))
+
+
+def run_episode(index, level_seed):
+    """Play one episode and write its row into the shared results."""
+    from level_stream import LevelFile
+
+    game = _worker["game"]
+    policy = _worker["policy"]
+    if policy == "mixed":
+        policy = POLICIES[index % len(POLICIES)]
+    level = LevelFile(level_path(_worker["levels_dir"], _worker["width"], level_seed))
+    world = game.World(level)
+    player = world.player
+    rng = random.Random(index)
+    step = world.step
+    goal = world.level_width - player.rect.width
+
+    frame = 0
+    completed = 0
+    max_x = 0
+    for frame in range(1, _worker["frames"] + 1):
+        step(policy_inputs(game, policy, rng, frame))
+        if player.rect.x > max_x:
+            max_x = player.rect.x
+        if player.rect.x >= goal:
+            completed = 1
+            break
+
+    row = _worker["results"][index]
+    row["completed"] = completed
+    row["deaths"] = world.deaths
+    row["frames"] = frame
+    row["coin_blocks"] = len(world.used_corners)
+    row["max_x"] = max_x
+    level.close()
+
+
+def run_range(start, stop, level_count):
+    for index in range(start, stop):
+        run_episode(index, index % level_count)
+    return stop - start
+
+
+# --- Parent side ---
+def run_batch(episodes, workers, width, levels, frames, policy, levels_dir, chunk=8):
+    """Run a batch and return (results array copy, seconds)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(episodes * RESULT_DTYPE.itemsize, 1))
+    results = np.ndarray((episodes,), dtype=RESULT_DTYPE, buffer=shm.buf)
+    try:
+        results[:] = 0
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, episodes, width, frames, policy, levels_dir)) as pool:
+            futures = [pool.submit(run_range, first, min(first + chunk, episodes), levels)
+                       for first in range(0, episodes, chunk)]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - start
+        return results.copy(), elapsed
+    finally:
+        del results # Drop the view so the block can be closed
+        shm.close()
+        shm.unlink()
+
+
+def summarize(results, elapsed, workers):
+    episodes = len(results)
+    return {
+        "workers": workers,
+        "episodes": episodes,
+        "seconds": elapsed,
+        "episodes_per_sec": episodes / elapsed if elapsed else 0.0,
+        "frames_per_sec": int(results["frames"].sum()) / elapsed if elapsed else 0.0,
+        "completion_rate": float(results["completed"].mean()) if episodes else 0.0,
+        "mean_deaths": float(results["deaths"].mean()) if episodes else 0.0,
+        "mean_frames": float(results["frames"].mean()) if episodes else 0.0,
+        "coin_blocks_hit": int(results["coin_blocks"].sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless episodes of the HDR platformer in parallel.")
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--levels", type=int, default=20, help="distinct generated levels")
+    parser.add_argument("--width", type=int, default=6000, help="level width in pixels")
+    parser.add_argument("--frames", type=int, default=3600, help="frame limit per episode")
+    parser.add_argument("--policy", choices=POLICIES + ("mixed",), default="mixed")
+    parser.add_argument("--scaling", action="store_true",
+                        help="repeat the batch with 1, 2, 4 ... workers and report episodes/sec")
+    parser.add_argument("--save", help="write the per-episode results array here (.npy)")
+    args = parser.parse_args()
+
+    from level_stream import generate_level
+
+    with tempfile.TemporaryDirectory() as levels_dir:
+        for seed in range(args.levels):
+            generate_level(level_path(levels_dir, args.width, seed), args.width, seed=seed)
+
+        if args.scaling:
+            counts = []
+            n = 1
+            while n < args.workers:
+                counts.append(n)
+                n *= 2
+            counts.append(args.workers)
+        else:
+            counts = [args.workers]
+
+        report = []
+        for workers in counts:
+            results, elapsed = run_batch(args.episodes, workers, args.width, args.levels,
+                                         args.frames, args.policy, levels_dir)
+            report.append(summarize(results, elapsed, workers))
+            print("%2d workers: %8.1f episodes/sec" % (workers, report[-1]["episodes_per_sec"]),
+                  file=sys.stderr)
+
+    if args.save:
+        np.save(args.save, results)
+    print(json.dumps(report if args.scaling else report[0], indent=2))
+
+
+if __name__ == "__main__":
+    main()
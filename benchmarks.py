@@ -0,0 +1,392 @@
+"""Headless benchmarks for the platformers and the trophy viewer.
+
+Runs against SDL's dummy video driver, so no window is needed:
+
+    python benchmarks.py                        # print results as JSON
+    python benchmarks.py --output results.json  # ...or write them to a file
+    python benchmarks.py --save-baseline bench_baseline.json
+    python benchmarks.py --baseline bench_baseline.json
+
+Every case reports ops/sec and per-frame latency percentiles in
+milliseconds. With --baseline, a case counts as a regression when its ops/sec
+drop by more than --tolerance, or when its cost grows faster with level size
+than it did in the baseline (scaling is compared as a ratio to the smallest
+size of the same case, so it holds across machines). Exits 1 on regressions.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import programhdrcapev0 as trophy
+import samsofthdr as hdr
+import samsoftsmb as smb
+from engine import PlatformGrid, fill_platforms
+from enemy_pool import EnemyGroup
+from framebuffer import Framebuffer
+from level_stream import LevelFile, generate_level
+from particles import ParticleSystem
+from rotation_cache import RotationCache
+from spatial_hash import SpatialHashGroup
+from static_layer import StaticLayer
+from trophy_catalog import Trophy, TrophyCatalog, TrophyLoader, generate_catalog
+
+# Level widths in pixels and matching entity counts for the scaling cases
+SIZES = (2000, 20000, 200000)
+ENEMY_COUNTS = (100, 1000, 10000)
+# Live particles for the particle cases
+PARTICLE_COUNTS = (5000, 50000)
+# bench_hdr's cases, timed at every size as "hdr.<case>/<size>"
+HDR_CASES = ("step", "player_update", "enemy_update", "enemy_collide", "step_tiles",
+             "player_update_tiles", "snapshot", "restore", "step_and_render",
+             "step_and_render_lowres")
+
+
+class Keys:
+    """Stands in for pygame.key.get_pressed() in the samsoftsmb cases."""
+    def __init__(self, *pressed):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+def input_script(frames, seed=0):
+    """A reproducible run-right-and-jump input sequence (as bitmasks)."""
+    rnd = random.Random(seed)
+    return [hdr.INPUT_RIGHT | (hdr.INPUT_JUMP if rnd.random() < 0.2 else 0)
+            | (hdr.INPUT_LEFT if rnd.random() < 0.1 else 0)
+            for _ in range(frames)]
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(frame, frames, ops_per_frame=1):
+    """Time `frame(i)` for i in range(frames) and summarize it."""
+    timer = time.perf_counter_ns
+    samples = []
+    append = samples.append
+    start = timer()
+    for i in range(frames):
+        t0 = timer()
+        frame(i)
+        append(timer() - t0)
+    total = (timer() - start) / 1e9
+    samples.sort()
+    ms = 1e-6
+    return {
+        "frames": frames,
+        "ops_per_sec": frames * ops_per_frame / total if total else 0.0,
+        "mean_ms": sum(samples) / len(samples) * ms,
+        "p50_ms": percentile(samples, 0.50) * ms,
+        "p95_ms": percentile(samples, 0.95) * ms,
+        "p99_ms": percentile(samples, 0.99) * ms,
+        "max_ms": samples[-1] * ms,
+    }
+
+
+# --- Cases ---
+def bench_hdr(results, frames, tmpdir):
+    """samsofthdrv0x..x.py: World.step phases and rendering on generated levels."""
+    screen = pygame.Surface((hdr.SCREEN_WIDTH, hdr.SCREEN_HEIGHT))
+    for size in SIZES:
+        if not results.wants(*["hdr.%s/%d" % (case, size) for case in HDR_CASES]):
+            continue # Don't generate a level no case times
+        path = os.path.join(tmpdir, "level_%d.lvl" % size)
+        generate_level(path, size, seed=size, enemy_every=150)
+        inputs = input_script(frames)
+
+        world = hdr.World(LevelFile(path))
+        results.measure("hdr.step/%d" % size, lambda i: world.step(inputs[i]), frames)
+
+        # Individual phases on a fresh world
+        world = hdr.World(LevelFile(path))
+        player = world.player
+        results.measure("hdr.player_update/%d" % size,
+                        lambda i: player.update(inputs[i], world.platform_list, world.camera_x),
+                        frames)
+        results.measure("hdr.enemy_update/%d" % size, lambda i: world.enemy_list.update(), frames)
+        results.measure("hdr.enemy_collide/%d" % size, lambda i: world.enemy_list.collide(player),
+                        frames)
+
+        # Tile-grid collision: constant work per step whatever the density
+        world = hdr.World(LevelFile(path), collision="tiles")
+        results.measure("hdr.step_tiles/%d" % size, lambda i: world.step(inputs[i]), frames)
+        world = hdr.World(LevelFile(path), collision="tiles")
+        player = world.player
+        results.measure("hdr.player_update_tiles/%d" % size,
+                        lambda i: player.update(inputs[i], world.platform_list, world.camera_x),
+                        frames)
+
+        # Rollback state: one snapshot into a reused buffer, one restore
+        if results.wants("hdr.snapshot/%d" % size, "hdr.restore/%d" % size):
+            world = hdr.simulate(inputs, hdr.World(LevelFile(path)))
+            buffer = world.snapshot()
+            results.measure("hdr.snapshot/%d" % size, lambda i: world.snapshot(buffer), frames)
+            results.measure("hdr.restore/%d" % size, lambda i: world.restore(buffer), frames)
+
+        world = hdr.World(LevelFile(path))
+        layer = StaticLayer(world.platform_list, world.level_width, hdr.SCREEN_HEIGHT, hdr.SKY_BLUE)
+        def render(i):
+            world.step(inputs[i])
+            hdr.draw_world(screen, world, layer)
+        results.measure("hdr.step_and_render/%d" % size, render, frames)
+
+        # GBA-sized framebuffer upscaled 3x to a window bigger than the default
+        framebuffer = Framebuffer((240, 160), pygame.Surface((720, 480)))
+        world = hdr.World(LevelFile(path), view_size=framebuffer.size)
+        layer = StaticLayer(world.platform_list, world.level_width, hdr.SCREEN_HEIGHT, hdr.SKY_BLUE)
+        def render_lowres(i):
+            world.step(inputs[i])
+            hdr.draw_world(framebuffer.surface, world, layer)
+            framebuffer.present()
+        results.measure("hdr.step_and_render_lowres/%d" % size, render_lowres, frames)
+
+
+def bench_enemies(results, frames):
+    """EnemyGroup patrols and the stomp/damage loop at increasing counts.
+
+    The .../active cases wake only the enemies around the player, the way
+    World.step does, so their cost should stay flat as the count grows.
+    """
+    for active in (False, True):
+        for count in ENEMY_COUNTS:
+            name = ("hdr.enemies/active/%d" if active else "hdr.enemies/%d") % count
+            if not results.wants(name):
+                continue
+            rnd = random.Random(count)
+            group = EnemyGroup(hdr.Enemy(rnd.randrange(0, count * 20), 280, rnd.randrange(20, 200))
+                               for _ in range(count))
+            player = hdr.Player(0, 270)
+            def frame(i):
+                if active:
+                    group.activate(player.rect.x - hdr.SCREEN_WIDTH, player.rect.x + hdr.SCREEN_WIDTH)
+                group.update()
+                player.rect.x = (i * 7) % (count * 20)
+                for hit_enemy in group.collide(player):
+                    if player.vel_y > 0 and (player.rect.bottom < hit_enemy.rect.centery + 10):
+                        hit_enemy.kill()
+                    else:
+                        player.take_damage()
+            results.measure(name, frame, frames)
+
+
+def bench_smb(results, frames):
+    """samsoftsmb.py: Player.update, Enemy.update and the full-screen draw."""
+    screen = pygame.Surface((smb.SCREEN_WIDTH, smb.SCREEN_HEIGHT))
+    keys = Keys(pygame.K_RIGHT)
+    for count in ENEMY_COUNTS:
+        if not results.wants(*["smb.%s/%d" % (case, count)
+                               for case in ("player_update", "enemy_update", "render")]):
+            continue
+        rnd = random.Random(count)
+        platforms = PlatformGrid()
+        platforms.add(0, smb.SCREEN_HEIGHT - 40, smb.SCREEN_WIDTH, 40)
+        for _ in range(count):
+            platforms.add(rnd.randrange(0, 20000), rnd.randrange(0, 300), 40, 20)
+        enemies = SpatialHashGroup(smb.Enemy(rnd.randrange(0, 20000), 280, 80) for _ in range(count))
+        player = smb.Player(50, 300)
+
+        def frame(i):
+            player.update(keys, platforms)
+            if player.rect.right >= smb.SCREEN_WIDTH:
+                player.reset(50, 300)
+        results.measure("smb.player_update/%d" % count, frame, frames)
+        results.measure("smb.enemy_update/%d" % count, lambda i: enemies.update(), frames)
+        def draw(i):
+            screen.fill(smb.SKY_BLUE)
+            screen.blit(player.image, player.rect)
+            fill_platforms(screen, platforms, 0)
+            screen.blits([(sprite.image, sprite.rect) for sprite in enemies], False)
+        results.measure("smb.render/%d" % count, draw, max(frames // 10, 10))
+
+
+def bench_particles(results, frames):
+    """ParticleSystem kept at a steady live count: bursts, update and draw.
+
+    Each frame bursts as many particles as expire on average, all over the
+    screen, so the count holds while slots are freed and reused.
+    """
+    screen = pygame.Surface((hdr.SCREEN_WIDTH, hdr.SCREEN_HEIGHT))
+    life = 60
+    for count in PARTICLE_COUNTS:
+        if not results.wants("particles.frame/%d" % count):
+            continue
+        particles = ParticleSystem(capacity=count * 2)
+        rnd = random.Random(count)
+        per_frame = count * 2 // (life * 3 // 2) # lifetimes average 3/4 of life
+        def frame(i):
+            for _ in range(per_frame // 50):
+                rect = (rnd.randrange(0, hdr.SCREEN_WIDTH), rnd.randrange(0, hdr.SCREEN_HEIGHT), 20, 20)
+                particles.burst(rect, 50, hdr.BROWN, 4, life)
+            particles.update()
+            screen.fill(hdr.SKY_BLUE)
+            particles.draw(screen)
+        for i in range(life): # Fill up to the steady count
+            frame(i)
+        results.measure("particles.frame/%d" % count, frame, frames)
+
+
+def bench_trophy(results, frames, tmpdir):
+    """programhdrcapev0.py: one viewer frame, cold (uncached) and warm, and
+    switching trophies in a big catalog."""
+    if not results.wants("trophy.frame_uncached", "trophy.frame_cached", "trophy.switch_cold"):
+        return
+    pygame.font.init()
+    screen = pygame.Surface((trophy.SCREEN_WIDTH, trophy.SCREEN_HEIGHT))
+    fonts = (pygame.font.Font(None, 34), pygame.font.Font(None, 24), pygame.font.Font(None, 22))
+    feather = trophy.create_feather_surface(trophy.FEATHER_BASE_WIDTH, trophy.FEATHER_BASE_HEIGHT)
+    cache = RotationCache(lambda angle: trophy.render_rotation_frame(feather, angle),
+                          trophy.ROTATION_STEPS, trophy.ROTATION_CACHE_BUDGET)
+    feather_trophy = Trophy(0, trophy.TROPHY_TITLE, trophy.TROPHY_GAME, trophy.TROPHY_DESCRIPTION, None)
+    panel = trophy.bake_text_panel(*fonts, feather_trophy)
+
+    def draw(frame_surface, y_offset, text):
+        screen.fill(trophy.BACKGROUND_COLOR)
+        if frame_surface is not None:
+            screen.blit(frame_surface, frame_surface.get_rect(
+                center=(trophy.SCREEN_WIDTH * 0.25, trophy.SCREEN_HEIGHT / 2 + y_offset)))
+        text()
+
+    def cold(i):
+        angle = i * 0.05
+        draw(trophy.render_rotation_frame(feather, angle), i % 20 - 10,
+             lambda: trophy.draw_trophy_text(screen, trophy.SCREEN_WIDTH * 0.5, *fonts, feather_trophy))
+        trophy.TEXT_CACHE.clear()
+    results.measure("trophy.frame_uncached", cold, frames)
+
+    def warm(i):
+        draw(cache.get(i * 0.05), i % 20 - 10,
+             lambda: screen.blit(panel, (trophy.SCREEN_WIDTH * 0.5, 0)))
+    results.measure("trophy.frame_cached", warm, frames)
+
+    # Next trophy, without waiting for the prefetcher: row load, art and text panel
+    if not results.wants("trophy.switch_cold"):
+        return
+    path = os.path.join(tmpdir, "trophies.db")
+    generate_catalog(path, 5000)
+    catalog = TrophyCatalog(path)
+    ids = catalog.ids()
+    loader = TrophyLoader(catalog, trophy.TrophyView)
+    def switch(i):
+        view = loader.get(ids[i % len(ids)])
+        trophy.bake_text_panel(*fonts, view.trophy)
+        view.rotation_cache.get(0.3)
+    results.measure("trophy.switch_cold", switch, frames)
+    catalog.close()
+
+
+class Results(dict):
+    """Case name -> measure() summary, for the cases whose name contains only."""
+
+    def __init__(self, only=None):
+        super().__init__()
+        self.only = only
+
+    def wants(self, *names):
+        """Whether any of names is timed, so the cases' setup is worth doing."""
+        return not self.only or any(self.only in name for name in names)
+
+    def measure(self, name, frame, frames, ops_per_frame=1):
+        """Time a case into self[name], unless it's filtered out."""
+        if self.wants(name):
+            self[name] = measure(frame, frames, ops_per_frame)
+
+
+# --- Baseline comparison ---
+def scaling(results):
+    """Cost of each sized case relative to the smallest size of that case."""
+    families = {}
+    for name, stats in results.items():
+        if "/" in name:
+            family, size = name.rsplit("/", 1)
+            families.setdefault(family, []).append((int(size), stats["mean_ms"]))
+    ratios = {}
+    for family, points in families.items():
+        points.sort()
+        smallest = points[0][1] or 1e-9
+        for size, mean in points[1:]:
+            ratios["%s/%d" % (family, size)] = mean / smallest
+    return ratios
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against a baseline."""
+    regressions = []
+    for name, stats in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old and stats["ops_per_sec"] < old["ops_per_sec"] * (1 - tolerance):
+            regressions.append("%s: %.0f ops/sec, baseline %.0f"
+                               % (name, stats["ops_per_sec"], old["ops_per_sec"]))
+    old_scaling = baseline.get("scaling", {})
+    for name, ratio in scaling(results).items():
+        old = old_scaling.get(name)
+        if old and ratio > old * (1 + tolerance) and ratio > 1.5:
+            regressions.append("%s: scales %.1fx over the smallest size, baseline %.1fx"
+                               % (name, ratio, old))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=600, help="frames per case")
+    parser.add_argument("--only", help="time only cases whose name contains this, e.g. hdr.step")
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--save-baseline", help="also write the results here as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    pygame.init()
+    results = Results(args.only)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bench_hdr(results, args.frames, tmpdir)
+        bench_enemies(results, args.frames)
+        bench_smb(results, args.frames)
+        bench_particles(results, args.frames)
+        bench_trophy(results, args.frames, tmpdir)
+    pygame.quit()
+    if not results:
+        parser.error("no case name contains %r" % args.only)
+
+    report = {
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "frames": args.frames,
+        "results": results,
+        "scaling": scaling(results),
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+
+    if report.get("regressions"):
+        for line in report["regressions"]:
+            print("REGRESSION " + line, file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+import numpy as np
+import pygame
+
+# Width of the cells that index enemies by patrol span for activate()
+ACTIVATION_CELL = 256
+
+# One enemy's record in a snapshot (see EnemyGroup.save_state)
+STATE_DTYPE = np.dtype([
+    ("x", "<i4"), ("prev_x", "<i4"), ("y", "<i4"), ("w", "<i4"), ("h", "<i4"),
+    ("start_x", "<i4"), ("move_range", "<i4"), ("direction", "<i4"),
+    ("awake", "?"), ("slept_at", "<i8"),
+])
+
+
+# --- Enemy Group ---
+class EnemyGroup(pygame.sprite.Group):
+    """A sprite group that keeps its patrolling enemies in NumPy arrays.
+
+    Position, size, start_x, move_range and direction live in contiguous
+    arrays (structure of arrays), so update() moves every enemy in one
+    vectorized step and collide() runs one batched AABB test instead of a
+    Python loop per Enemy. The Enemy sprites are still real sprites: kill()
+    removes them from this group like any other, and their rects are
+    written back on demand with sync() (e.g. right before drawing).
+
+    prev_x holds each x from before the last update(), so a renderer can
+    draw in between two updates with interpolated().
+
+    activate(left, right) limits update() and the rect queries to enemies
+    whose patrol reaches that x range; the rest sleep. A patrol is a fixed
+    back-and-forth, so a waking enemy is fast-forwarded by the updates it
+    slept through and ends up exactly where it would have been had it
+    never slept. Until activate() is called every enemy is awake.
+    """
+
+    # Per-enemy state arrays and their dtypes
+    FIELDS = (
+        ("x", np.int64), ("prev_x", np.int64),
+        ("y", np.int64), ("w", np.int64), ("h", np.int64),
+        ("start_x", np.int64), ("move_range", np.int64),
+        ("direction", np.int64), ("alive", np.bool_),
+        ("awake", np.bool_), ("slept_at", np.int64),
+    )
+
+    def __init__(self, *sprites, capacity=64):
+        self.count = 0        # slots in use, alive or dead
+        self.dead = 0         # dead slots waiting for compaction
+        self.slots = {}       # sprite -> slot index
+        self.slot_sprites = []
+        self.ticks = 0        # update() calls so far
+        self.cells = {}       # activation cell -> slots whose patrol reaches it
+        self.region = None    # activation cells (first, last), None = all awake
+        self.active = None    # sorted slot array of awake enemies, None = all
+        self.active_set = None
+        self.index_dirty = False
+        self._allocate(capacity)
+        super().__init__(*sprites)
+
+    def _allocate(self, capacity):
+        """Grow (or create) every state array to hold capacity enemies."""
+        for name, dtype in self.FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                array[:self.count] = old[:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        i = self.count
+        rect = sprite.rect
+        self.x[i] = rect.x
+        self.prev_x[i] = rect.x
+        self.y[i] = rect.y
+        self.w[i] = rect.width
+        self.h[i] = rect.height
+        self.start_x[i] = sprite.start_x
+        self.move_range[i] = sprite.move_range
+        self.direction[i] = sprite.direction
+        self.alive[i] = True
+        # With a region, new enemies sleep until the next activate() looks at them
+        self.awake[i] = self.region is None
+        self.slept_at[i] = self.ticks
+        self.slots[sprite] = i
+        self.slot_sprites.append(sprite)
+        self.count += 1
+        self._index_slot(i)
+        self.index_dirty = True
+
+    def add_patrolling(self, sprites, since=0):
+        """Add new enemies as if they had been patrolling since update()
+        number since.
+
+        Each one is fast-forwarded from its spawn point the way a waking
+        enemy is, so where it is depends only on the update count and not
+        on when it was added.
+        """
+        first = self.count
+        self.add(sprites)
+        added = np.arange(first, self.count)
+        self.slept_at[added] = since
+        self.catch_up(added)
+        self.prev_x[added] = self.x[added]
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        i = self.slots.pop(sprite)
+        # Write the final state back so a killed sprite looks like it would
+        # have with a plain Group.
+        if not self.awake[i]:
+            self.catch_up(np.array([i]))
+        self._sync_slot(sprite, i)
+        self.alive[i] = False
+        self.slot_sprites[i] = None
+        self.dead += 1
+
+    def _compact(self):
+        """Drop dead slots, keeping the survivors in insertion order."""
+        n = self.count
+        keep = np.flatnonzero(self.alive[:n])
+        for name, _ in self.FIELDS:
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        sprites = [self.slot_sprites[i] for i in keep]
+        self.count = len(keep)
+        self.alive[self.count:n] = False
+        self.slot_sprites = sprites
+        self.slots = {sprite: i for i, sprite in enumerate(sprites)}
+        self.dead = 0
+
+        # Renumber the activation index and the active set
+        self.cells = {}
+        for i in range(self.count):
+            self._index_slot(i)
+        if self.active is not None:
+            new_index = np.full(n, -1, dtype=np.int64)
+            new_index[keep] = np.arange(len(keep))
+            active = new_index[self.active]
+            self.active = active[active >= 0]
+            self.active_set = set(self.active.tolist())
+
+    # --- Activation ---
+    def _index_slot(self, i):
+        """File slot i under every cell its patrol can reach."""
+        speed = abs(int(self.direction[i]))
+        left = int(self.start_x[i]) - speed
+        right = int(self.start_x[i] + self.move_range[i] + self.w[i]) + speed
+        for cell in range(left // ACTIVATION_CELL, right // ACTIVATION_CELL + 1):
+            self.cells.setdefault(cell, []).append(i)
+
+    def activate(self, left, right):
+        """Wake the enemies whose patrol reaches [left, right), sleep the rest.
+
+        Works a whole ACTIVATION_CELL at a time, so calling it every frame
+        costs nothing until the range crosses into another cell.
+        """
+        region = (left // ACTIVATION_CELL, (right - 1) // ACTIVATION_CELL)
+        if region == self.region and not self.index_dirty:
+            return
+        wanted = self.reaching(left, right)
+        if self.active_set is None:
+            n = self.count
+            current = set(np.flatnonzero(self.alive[:n] & self.awake[:n]).tolist())
+        else:
+            current = self.active_set
+
+        sleeping = np.array(sorted(current - wanted), dtype=np.int64)
+        self.awake[sleeping] = False
+        self.slept_at[sleeping] = self.ticks
+        waking = np.array(sorted(wanted - current), dtype=np.int64)
+        self.catch_up(waking)
+        self.prev_x[waking] = self.x[waking]
+        self.awake[waking] = True
+
+        self.active_set = wanted
+        self.active = np.array(sorted(wanted), dtype=np.int64)
+        self.region = region
+        self.index_dirty = False
+
+    def reaching(self, left, right):
+        """Return the set of slot indices of living enemies whose patrol
+        can reach [left, right), by whole ACTIVATION_CELLs."""
+        first = left // ACTIVATION_CELL
+        last = (right - 1) // ACTIVATION_CELL
+        if last - first < len(self.cells):
+            cells = range(first, last + 1)
+        else: # A very wide range: walk the index instead
+            cells = [cell for cell in self.cells if first <= cell <= last]
+        alive = self.alive
+        found = set()
+        for cell in cells:
+            found.update(i for i in self.cells.get(cell, ()) if alive[i])
+        return found
+
+    def catch_up(self, indices=None):
+        """Fast-forward sleeping enemies over the updates they missed.
+
+        A patrol bounces between two fixed turning points xl < start_x and
+        xr > start_x + move_range, one speed step at a time, so its state
+        is a phase on a cycle of 2 * (xr - xl) / speed updates. Defaults to
+        every sleeping enemy.
+        """
+        if indices is None:
+            n = self.count
+            indices = np.flatnonzero(self.alive[:n] & ~self.awake[:n])
+        if not len(indices):
+            return
+        steps = self.ticks - self.slept_at[indices]
+        self.slept_at[indices] = self.ticks
+        x = self.x[indices]
+        direction = self.direction[indices]
+        speed = np.abs(direction)
+        moving = (speed > 0) & (steps > 0)
+        speed = np.where(speed > 0, speed, 1)
+        start = self.start_x[indices]
+        end = start + self.move_range[indices]
+
+        # Turning points on the lattice of x values this patrol can reach
+        residue = x % speed
+        xl = start - 1 - (start - 1 - residue) % speed
+        xr = end + 1 + (residue - end - 1) % speed
+        half = (xr - xl) // speed
+        phase = np.where(direction > 0, (x - xl) // speed, half + (xr - x) // speed)
+        phase = (phase + steps) % (2 * half)
+        outward = phase < half
+        self.x[indices] = np.where(moving, np.where(outward, xl + phase * speed,
+                                                    xr - (phase - half) * speed), x)
+        self.direction[indices] = np.where(moving, np.where(outward, speed, -speed), direction)
+
+    def update(self, *args, **kwargs):
+        """Advance every patrol by one frame (same rule as Enemy.update)."""
+        self.ticks += 1
+        if self.dead > 64 and self.dead * 2 > self.count:
+            self._compact()
+        if self.active is not None:
+            self._update_active()
+            return
+        n = self.count
+        x = self.x[:n]
+        direction = self.direction[:n]
+        alive = self.alive[:n]
+        start_x = self.start_x[:n]
+        self.prev_x[:n] = x
+
+        # Move back and forth
+        np.add(x, direction, out=x, where=alive)
+        turn = (x > start_x + self.move_range[:n]) | (x < start_x)
+        turn &= alive
+        np.negative(direction, out=direction, where=turn) # Turn around
+
+    def _update_active(self):
+        """update() for just the awake enemies."""
+        indices = self.active
+        x = self.x[indices]
+        direction = self.direction[indices]
+        alive = self.alive[indices]
+        start_x = self.start_x[indices]
+        self.prev_x[indices] = x
+
+        np.add(x, direction, out=x, where=alive)
+        turn = (x > start_x + self.move_range[indices]) | (x < start_x)
+        turn &= alive
+        np.negative(direction, out=direction, where=turn)
+        self.x[indices] = x
+        self.direction[indices] = direction
+
+    def overlapping(self, rect):
+        """Return slot indices of living enemies whose rect overlaps rect.
+
+        After activate() only awake enemies are tested.
+        """
+        if self.active is not None:
+            indices = self.active
+            x = self.x[indices]
+            y = self.y[indices]
+            hit = ((x < rect.right) & (x + self.w[indices] > rect.left) &
+                   (y < rect.bottom) & (y + self.h[indices] > rect.top))
+            hit &= self.alive[indices]
+            return indices[hit]
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        # Same test as pygame.Rect.colliderect
+        hit = ((x < rect.right) & (x + self.w[:n] > rect.left) &
+               (y < rect.bottom) & (y + self.h[:n] > rect.top))
+        hit &= self.alive[:n]
+        return np.flatnonzero(hit)
+
+    def collide(self, sprite):
+        """Same result as pygame.sprite.spritecollide(sprite, self, False)."""
+        if not self.count or not sprite.rect.width or not sprite.rect.height:
+            return []
+        hits = []
+        for i in self.overlapping(sprite.rect).tolist():
+            enemy = self.slot_sprites[i]
+            self._sync_slot(enemy, i)
+            hits.append(enemy)
+        return hits
+
+    def interpolated(self, rect, alpha):
+        """Return (sprites, xs) for the living enemies overlapping rect.
+
+        xs are blended between each enemy's x before and after the last
+        update(): alpha 0 is the previous position, 1 the current one.
+        Sprite rects are left alone.
+        """
+        indices = self.overlapping(rect)
+        prev_x = self.prev_x[indices]
+        xs = prev_x + np.rint((self.x[indices] - prev_x) * alpha).astype(np.int64)
+        sprites = self.slot_sprites
+        return [sprites[i] for i in indices.tolist()], xs.tolist()
+
+    def _sync_slot(self, sprite, i):
+        sprite.rect.x = int(self.x[i])
+        sprite.direction = int(self.direction[i])
+
+    def sync(self, rect=None):
+        """Write array state back to the sprites' rects.
+
+        With a rect, only the enemies overlapping it are synced, so a
+        renderer can refresh just what is on screen. Without one, sleeping
+        enemies are caught up first.
+        """
+        if rect is None:
+            self.catch_up()
+            indices = np.flatnonzero(self.alive[:self.count]).tolist()
+        else:
+            indices = self.overlapping(rect).tolist()
+        xs = self.x
+        directions = self.direction
+        sprites = self.slot_sprites
+        for i in indices:
+            sprite = sprites[i]
+            sprite.rect.x = int(xs[i])
+            sprite.direction = int(directions[i])
+        return [sprites[i] for i in indices]
+
+    # --- Snapshots ---
+    def save_state(self, out):
+        """Copy the living enemies' state into out, a STATE_DTYPE array of
+        len(self) records.
+
+        Returns the living sprites, in the same (slot) order.
+        """
+        n = self.count
+        if self.dead:
+            keep = np.flatnonzero(self.alive[:n])
+            sprites = [self.slot_sprites[i] for i in keep.tolist()]
+        else:
+            keep = slice(0, n)
+            sprites = list(self.slot_sprites)
+        for name in STATE_DTYPE.names:
+            out[name] = getattr(self, name)[keep]
+        return sprites
+
+    def load_state(self, sprites, state, ticks, region):
+        """Go back to what save_state() saw: exactly sprites, in that slot
+        order, with their records from state.
+
+        Sprites that aren't in the list are killed and missing ones added.
+        ticks and region are the update() count and activation region to
+        restore; the next activate() rebuilds the awake set from the
+        restored awake flags. When the sprites are the ones already in
+        the slots (the usual case for a short rollback) this is a handful
+        of array copies.
+        """
+        n = len(sprites)
+        reindex = self.dead or self.slot_sprites != sprites
+        if reindex:
+            present = self.spritedict
+            for sprite in set(present).difference(sprites):
+                sprite.kill()
+            self.add([sprite for sprite in sprites if sprite not in present])
+            self.alive[n:self.count] = False
+            self.count = n
+            self.dead = 0
+            self.slot_sprites = list(sprites)
+            self.slots = {sprite: i for i, sprite in enumerate(sprites)}
+        for name in STATE_DTYPE.names:
+            getattr(self, name)[:n] = state[name]
+        self.alive[:n] = True
+        self.ticks = ticks
+        if reindex:
+            self.cells = {}
+            for i in range(n):
+                self._index_slot(i)
+        self.region = region
+        self.active = None if region is None else np.flatnonzero(self.awake[:n])
+        self.active_set = None
+        self.index_dirty = True
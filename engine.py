@@ -0,0 +1,426 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+import pygame
+
+from surface_pool import SURFACE_POOL
+
+# --- Constants ---
+# Physics shared by both platformers
+GRAVITY = 0.5
+JUMP_STRENGTH = -12
+PLAYER_SPEED = 5
+ENEMY_SPEED = 2
+
+GREEN = (0, 150, 0)       # Ground / default platform
+BROWN = (139, 69, 19)     # Enemy
+
+# Width of the columns the platform index buckets blocks into, in pixels
+COLUMN_WIDTH = 64
+
+
+# --- Enemy Class ---
+class Enemy(pygame.sprite.Sprite):
+    def __init__(self, x, y, move_range):
+        super().__init__()
+        self.image = SURFACE_POOL.solid((20, 20), BROWN)
+        self.rect = self.image.get_rect()
+        self.rect.topleft = (x, y)
+
+        self.start_x = x
+        self.move_range = move_range
+        self.direction = ENEMY_SPEED
+
+    def update(self):
+        # Move back and forth
+        self.rect.x += self.direction
+        if self.rect.x > self.start_x + self.move_range or self.rect.x < self.start_x:
+            self.direction *= -1 # Turn around
+
+
+# --- Platforms ---
+class Platform:
+    """A view of one block in a PlatformGrid.
+
+    Views are made by the grid's queries and hold nothing but the grid, the
+    block's index and its rect; color, type and dirty read and write the
+    grid's arrays. They quack like the old Platform sprites (rect, color,
+    type, dirty, image), so collision and drawing code takes either.
+    """
+    __slots__ = ("grid", "index", "rect")
+
+    def __init__(self, grid, index):
+        self.grid = grid
+        self.index = index
+        self.rect = pygame.Rect(grid.x[index], grid.y[index], grid.w[index], grid.h[index])
+
+    @property
+    def color(self):
+        return self.grid.kinds[self.grid.kind[self.index]][0]
+
+    @color.setter
+    def color(self, color):
+        self.grid.set_kind(self.index, color, self.type)
+
+    @property
+    def type(self):
+        return self.grid.kinds[self.grid.kind[self.index]][1]
+
+    @type.setter
+    def type(self, type):
+        self.grid.set_kind(self.index, self.color, type)
+
+    @property
+    def dirty(self):
+        """1 when the look changed after a StaticLayer baked it."""
+        return int(self.index in self.grid.dirty)
+
+    @dirty.setter
+    def dirty(self, dirty):
+        if dirty:
+            self.grid.dirty.add(self.index)
+        else:
+            self.grid.dirty.discard(self.index)
+
+    @property
+    def image(self):
+        """Shared solid surface for this size and color, made on first use."""
+        return SURFACE_POOL.solid(self.rect.size, self.color)
+
+
+class PlatformGrid:
+    """Static blocks packed into flat arrays, indexed by column.
+
+    A block is its rect (four ints), a one-byte kind (an interned
+    (color, type) pair) and an insertion serial, so a level's platforms
+    cost tens of bytes each instead of a Sprite, its __dict__, Rect and
+    group bookkeeping. query() and collide() work like SpatialHashGroup's
+    and build Platform views only for the blocks they return, which is all
+    that collision and drawing ever touch.
+
+    The index buckets blocks by fixed-width column only, each bucket sorted
+    by y, and a query bisects it for the rows it needs. Levels are wide and
+    one screen tall, so this costs a bucket per column instead of one per
+    (x, y) cell.
+
+    Indices of removed blocks are reused; the serial keeps query results in
+    insertion order regardless.
+    """
+
+    def __init__(self, column_width=COLUMN_WIDTH):
+        self.column_width = column_width
+        self.x = array("i")
+        self.y = array("i")
+        self.w = array("i")
+        self.h = array("i")
+        self.kind = array("B")   # 0 = free slot
+        self.serial = array("q") # insertion order
+        self.kinds = [None]      # kind -> (color, type)
+        self.kind_codes = {}     # (color, type) -> kind
+        self.columns = {}        # column -> array of block indices, sorted by y
+        self.max_height = 0      # tallest block, bounds how far up a query looks
+        self.free = []
+        self.dirty = set()
+        self.dirty_rects = set() # (x, y, w, h) areas changed with no block to flag
+        self.count = 0
+        self.next_serial = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Every block, in insertion order."""
+        kind = self.kind
+        indices = sorted((i for i in range(len(kind)) if kind[i]), key=self.serial.__getitem__)
+        return (Platform(self, i) for i in indices)
+
+    def _kind(self, color, type):
+        key = (tuple(color), type)
+        code = self.kind_codes.get(key)
+        if code is None:
+            if len(self.kinds) > 255:
+                raise ValueError("a PlatformGrid holds at most 255 (color, type) kinds")
+            code = self.kind_codes[key] = len(self.kinds)
+            self.kinds.append(key)
+        return code
+
+    def set_kind(self, index, color, type):
+        self.kind[index] = self._kind(color, type)
+
+    def column_span(self, left, width):
+        """Return the (first, last) columns an x range covers."""
+        return left // self.column_width, (left + width - 1) // self.column_width
+
+    def add(self, x, y, w, h, color=GREEN, type='platform'):
+        """Add a block and return its index."""
+        kind = self._kind(color, type)
+        if self.free:
+            i = self.free.pop()
+            self.x[i], self.y[i], self.w[i], self.h[i] = x, y, w, h
+            self.kind[i] = kind
+            self.serial[i] = self.next_serial
+        else:
+            i = len(self.kind)
+            self.x.append(x)
+            self.y.append(y)
+            self.w.append(w)
+            self.h.append(h)
+            self.kind.append(kind)
+            self.serial.append(self.next_serial)
+        self.next_serial += 1
+        self.count += 1
+        self.max_height = max(self.max_height, h)
+        first, last = self.column_span(x, w)
+        columns = self.columns
+        key = self.y.__getitem__
+        for column in range(first, last + 1):
+            bucket = columns.get(column)
+            if bucket is None:
+                bucket = columns[column] = array("i")
+            bucket.insert(bisect_right(bucket, y, key=key), i)
+        return i
+
+    def remove(self, index):
+        first, last = self.column_span(self.x[index], self.w[index])
+        columns = self.columns
+        for column in range(first, last + 1):
+            bucket = columns[column]
+            bucket.remove(index)
+            if not bucket:
+                del columns[column]
+        self.kind[index] = 0
+        self.dirty.discard(index)
+        self.free.append(index)
+        self.count -= 1
+
+    def block(self, index):
+        return Platform(self, index)
+
+    def query(self, rect):
+        """Return the blocks in rect's columns that overlap it vertically,
+        in insertion order.
+
+        Only the broadphase, like SpatialHashGroup.query().
+        """
+        first, last = self.column_span(rect[0], rect[2])
+        top = rect[1]
+        bottom = top + rect[3]
+        lowest_top = top - self.max_height # Blocks starting above can't reach top
+        columns = self.columns
+        y = self.y
+        h = self.h
+        key = y.__getitem__
+        found = set()
+        for column in range(first, last + 1):
+            bucket = columns.get(column)
+            if bucket:
+                start = bisect_right(bucket, lowest_top, key=key)
+                stop = bisect_left(bucket, bottom, lo=start, key=key)
+                for i in bucket[start:stop]:
+                    if y[i] + h[i] > top:
+                        found.add(i)
+        if len(found) > 1:
+            found = sorted(found, key=self.serial.__getitem__)
+        return [Platform(self, i) for i in found]
+
+    def collide(self, sprite):
+        """The blocks sprite.rect touches, like pygame.sprite.spritecollide()."""
+        colliderect = sprite.rect.colliderect
+        return [block for block in self.query(sprite.rect) if colliderect(block.rect)]
+
+
+def fill_platforms(screen, platforms, camera_x, camera_y=0):
+    """Fill the blocks of a PlatformGrid that the camera sees onto screen.
+
+    Platforms are solid colors, so no surfaces are needed. Each rect is
+    clipped first: fill() overshoots rects hanging off the left edge.
+    """
+    bounds = screen.get_rect()
+    for platform in platforms.query(bounds.move(camera_x, camera_y)):
+        screen.fill(platform.color, platform.rect.move(-camera_x, -camera_y).clip(bounds))
+
+
+# --- Tiles ---
+class Tile:
+    """A view of a horizontal run of same-coded tiles in a TileGrid.
+
+    Quacks like a Platform (rect, color, type, dirty, image). Setting color
+    or type re-codes the run's tiles to the palette entry with that color or
+    type.
+    """
+    __slots__ = ("grid", "col", "row", "length", "rect")
+
+    def __init__(self, grid, col, row, length=1):
+        self.grid = grid
+        self.col = col
+        self.row = row
+        self.length = length
+        size = grid.tile_size
+        self.rect = pygame.Rect(col * size, row * size, length * size, size)
+
+    @property
+    def code(self):
+        return self.grid.tile(self.col, self.row)
+
+    @property
+    def color(self):
+        return self.grid.palette[self.code][0]
+
+    @color.setter
+    def color(self, color):
+        self.grid.recode(self, self.grid.code_for(0, tuple(color)))
+
+    @property
+    def type(self):
+        return self.grid.palette[self.code][1]
+
+    @type.setter
+    def type(self, type):
+        self.grid.recode(self, self.grid.code_for(1, type))
+
+    @property
+    def dirty(self):
+        """1 when the look changed after a StaticLayer baked it."""
+        return int((self.col, self.row) in self.grid.dirty)
+
+    @dirty.setter
+    def dirty(self, dirty):
+        if dirty:
+            self.grid.dirty.add((self.col, self.row))
+        else:
+            self.grid.dirty.discard((self.col, self.row))
+
+    @property
+    def image(self):
+        return SURFACE_POOL.solid(self.rect.size, self.color)
+
+
+class TileGrid:
+    """A level's tiles as one flat bytearray, one byte per cell.
+
+    Cells hold tile codes, column-major like level files (column * height +
+    row); 0 is empty. palette maps every other code to (color, type).
+    Looking a cell up is O(1), so the player resolves collisions by
+    scanning only the cells its leading edge crosses (first_solid_column(),
+    first_solid_row()) and that costs the same however dense the level is.
+
+    query() and collide() return Tile views, runs of 'platform' tiles
+    merged, so renderers and StaticLayer take a TileGrid like a
+    PlatformGrid.
+    """
+
+    def __init__(self, tiles, width, height, tile_size, palette):
+        self.tiles = bytearray(tiles)
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.palette = palette # code -> (color, type)
+        self.dirty = set()     # (col, row) of tiles re-coded since baking
+
+    @classmethod
+    def from_level(cls, level, palette):
+        """Copy a LevelFile's whole tile map (width x height bytes)."""
+        start = level.tiles_offset
+        return cls(level.map[start:start + level.width * level.height],
+                   level.width, level.height, level.tile_size, palette)
+
+    def tile(self, col, row):
+        """The code at (col, row); outside the map is empty."""
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return self.tiles[col * self.height + row]
+        return 0
+
+    def type_at(self, col, row):
+        """The type of the tile at (col, row), None if it's empty."""
+        code = self.tile(col, row)
+        return self.palette[code][1] if code else None
+
+    def code_for(self, field, value):
+        for code, entry in self.palette.items():
+            if entry[field] == value:
+                return code
+        raise ValueError("no tile code with %r in the palette" % (value,))
+
+    def recode(self, tile, code):
+        height = self.height
+        for col in range(tile.col, tile.col + tile.length):
+            self.tiles[col * height + tile.row] = code
+
+    def positions(self, code):
+        """Yield (col, row) of every tile with code, column by column."""
+        tiles = self.tiles
+        byte = bytes((code,))
+        i = tiles.find(byte)
+        while i >= 0:
+            yield divmod(i, self.height)
+            i = tiles.find(byte, i + 1)
+
+    # --- Collision ---
+    def first_solid_column(self, cols, row0, row1):
+        """The first column of cols with a solid tile in rows row0..row1."""
+        row0 = max(row0, 0)
+        row1 = min(row1, self.height - 1)
+        if row0 > row1:
+            return None
+        tiles = self.tiles
+        height = self.height
+        for col in cols:
+            if 0 <= col < self.width:
+                base = col * height
+                if tiles[base + row0:base + row1 + 1].strip(b"\0"):
+                    return col
+        return None
+
+    def first_solid_row(self, rows, col0, col1):
+        """The first row of rows with a solid tile in columns col0..col1."""
+        col0 = max(col0, 0)
+        col1 = min(col1, self.width - 1)
+        if col0 > col1:
+            return None
+        tiles = self.tiles
+        height = self.height
+        for row in rows:
+            if 0 <= row < height:
+                if tiles[col0 * height + row:col1 * height + row + 1:height].strip(b"\0"):
+                    return row
+        return None
+
+    # --- Queries ---
+    def query(self, rect):
+        """Tile views for the solid tiles in the cells rect covers.
+
+        Runs of 'platform' tiles in a row come back as one view, like
+        LevelFile.chunk_runs(); every other tile is its own view.
+        """
+        size = self.tile_size
+        col0 = max(rect[0] // size, 0)
+        col1 = min((rect[0] + rect[2] - 1) // size, self.width - 1)
+        row0 = max(rect[1] // size, 0)
+        row1 = min((rect[1] + rect[3] - 1) // size, self.height - 1)
+        if col0 > col1 or row0 > row1:
+            return []
+        tiles = self.tiles
+        height = self.height
+        palette = self.palette
+        found = []
+        for row in range(row0, row1 + 1):
+            codes = tiles[col0 * height + row:col1 * height + row + 1:height]
+            if not codes.strip(b"\0"):
+                continue
+            run_start = None
+            for i, code in enumerate(codes + b"\0"):
+                if run_start is not None and code != codes[run_start]:
+                    found.append(Tile(self, col0 + run_start, row, i - run_start))
+                    run_start = None
+                if code:
+                    if palette[code][1] != 'platform':
+                        found.append(Tile(self, col0 + i, row))
+                    elif run_start is None:
+                        run_start = i
+        return found
+
+    def collide(self, sprite):
+        """The tiles sprite.rect touches."""
+        colliderect = sprite.rect.colliderect
+        return [tile for tile in self.query(sprite.rect) if colliderect(tile.rect)]
+
@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+import time
+
+import pygame
+
+# Directories the system font lookup scans, per platform
+if sys.platform == "win32":
+    FONT_DIRS = [os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+                 os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "Fonts")]
+elif sys.platform == "darwin":
+    FONT_DIRS = ["/System/Library/Fonts", "/Library/Fonts", os.path.expanduser("~/Library/Fonts")]
+else:
+    FONT_DIRS = ["/usr/share/fonts", "/usr/local/share/fonts",
+                 os.path.expanduser("~/.fonts"), os.path.expanduser("~/.local/share/fonts")]
+
+
+def default_cache_path():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "samsoft", "fonts.json")
+
+
+def font_dirs_signature(dirs=FONT_DIRS):
+    """mtimes of every font directory (and subdirectory) that exists.
+
+    Installing or removing a font touches its directory, which changes the
+    signature and invalidates the cache.
+    """
+    signature = []
+    for top in dirs:
+        for root, subdirs, _ in os.walk(top):
+            subdirs.sort()
+            try:
+                signature.append([root, os.stat(root).st_mtime_ns])
+            except OSError:
+                pass
+    return signature
+
+
+# --- Font Cache ---
+class FontCache:
+    """Resolves system font names once and remembers the files on disk.
+
+    pygame.font.SysFont scans every installed font (fc-list on Linux) the
+    first time it runs, which can take seconds. load() looks the family up
+    in a JSON cache of resolved file paths instead and opens the file with
+    pygame.font.Font directly; only a miss pays for the system scan. The
+    cache is dropped when any font directory's mtime changes.
+
+    load() times itself; report() summarizes the startup cost.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        self.entries = None # "name|bold|italic" -> {"path", "bold", "italic"}
+        self.dirty = False
+        self.loads = [] # (request, milliseconds, "cached" / "resolved" / "default")
+
+    def _read(self):
+        signature = font_dirs_signature()
+        self.entries = {}
+        self.signature = signature
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("signature") == signature:
+            self.entries = data.get("fonts", {})
+
+    def save(self):
+        """Write resolved fonts back to disk, if anything new was resolved."""
+        if not self.dirty:
+            return
+        data = {"signature": self.signature, "fonts": self.entries}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp = self.path + ".tmp"
+            with open(temp, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(temp, self.path)
+        except OSError as e:
+            print("Could not write font cache %s: %s" % (self.path, e))
+        self.dirty = False
+
+    def resolve(self, name, bold=False, italic=False):
+        """Find the font file for a family with the system lookup (slow).
+
+        Runs SysFont itself, so the match and the styles it has to
+        synthesize (only a regular face installed) are exactly SysFont's.
+        Returns an entry dict; "path" is None when the family isn't
+        installed.
+        """
+        entry = {}
+        def capture(path, size, set_bold, set_italic):
+            entry.update(path=path, bold=set_bold, italic=set_italic)
+            return None
+        pygame.font.SysFont(name, 1, bold, italic, constructor=capture)
+        return entry
+
+    def load(self, name, size, bold=False, italic=False, fallback_size=None):
+        """Return a pygame Font for a system family, like SysFont.
+
+        A family that isn't installed gives pygame's default font at
+        fallback_size (default: size), styled the way SysFont would.
+        """
+        start = time.perf_counter()
+        if self.entries is None:
+            self._read()
+        key = "%s|%d|%d" % (name.lower(), bold, italic)
+        entry = self.entries.get(key)
+        source = "cached"
+        font = None
+        if entry is not None and entry["path"] is not None:
+            try:
+                font = pygame.font.Font(entry["path"], size)
+            except (OSError, pygame.error): # Moved or broken since it was cached
+                entry = None
+        if entry is None:
+            source = "resolved"
+            entry = self.entries[key] = self.resolve(name, bold, italic)
+            self.dirty = True
+            if entry["path"] is not None:
+                font = pygame.font.Font(entry["path"], size)
+        if font is None:
+            source = "default"
+            print("%s font not found, using default font." % name)
+            font = pygame.font.Font(None, fallback_size or size)
+        font.set_bold(entry["bold"])
+        font.set_italic(entry["italic"])
+        self.loads.append(("%s %d%s%s" % (name, size, " bold" if bold else "", " italic" if italic else ""),
+                           (time.perf_counter() - start) * 1000, source))
+        return font
+
+    def report(self):
+        """One line: how long loading fonts took and where they came from."""
+        total = sum(ms for _, ms, _ in self.loads)
+        parts = ", ".join("%s: %.1f ms (%s)" % load for load in self.loads)
+        return "Fonts loaded in %.1f ms [%s]" % (total, parts)
@@ -0,0 +1,127 @@
+import json
+import time
+
+import numpy as np
+import pygame
+
+# Overlay colors, one per phase (cycled if there are more phases)
+PHASE_COLORS = [
+    (80, 160, 255), (255, 120, 60), (120, 220, 90), (230, 200, 40),
+    (200, 100, 220), (60, 220, 220), (240, 70, 120), (180, 180, 180),
+]
+
+
+def _noop(*args):
+    pass
+
+
+# --- Frame Profiler ---
+class FrameProfiler:
+    """Opt-in per-phase frame timing.
+
+    Call begin_frame() at the top of the loop, mark(phase) right after each
+    phase finishes and end_frame() at the bottom. Durations go into a
+    fixed-size ring buffer (capacity frames x phases), which feeds the
+    on-screen graph (draw_overlay) and the Chrome trace export
+    (dump_chrome_trace, open it in chrome://tracing or Perfetto).
+
+    When disabled the three calls are bound to a no-op, so leaving them in
+    the loop costs one empty function call each.
+    """
+
+    def __init__(self, phases, capacity=600, enabled=False):
+        self.phases = list(phases)
+        self.phase_index = {name: i for i, name in enumerate(self.phases)}
+        self.capacity = capacity
+        self.durations = np.zeros((capacity, len(self.phases)), dtype=np.int64) # ns
+        self.frame_starts = np.zeros(capacity, dtype=np.int64) # ns
+        self.frames = 0 # total frames recorded; frames % capacity is the next row
+        self.frame_start = 0
+        self.last_mark = 0
+        self.show_overlay = False
+        self.graph = None # Scrolling overlay surface
+        self.graph_frames = 0 # frames already drawn into it
+        self.enabled = False
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.begin_frame = self._begin_frame
+            self.mark = self._mark
+            self.end_frame = self._end_frame
+        else:
+            self.begin_frame = self.mark = self.end_frame = _noop
+
+    def _begin_frame(self):
+        row = self.frames % self.capacity
+        self.durations[row] = 0
+        self.frame_start = self.last_mark = time.perf_counter_ns()
+        self.frame_starts[row] = self.frame_start
+
+    def _mark(self, phase):
+        now = time.perf_counter_ns()
+        self.durations[self.frames % self.capacity, self.phase_index[phase]] += now - self.last_mark
+        self.last_mark = now
+
+    def _end_frame(self):
+        self.frames += 1
+
+    def recent(self):
+        """Return (frame_starts, durations) for the recorded frames, oldest first."""
+        count = min(self.frames, self.capacity)
+        order = (np.arange(self.frames - count, self.frames)) % self.capacity
+        return self.frame_starts[order], self.durations[order]
+
+    def draw_overlay(self, surface, pos=(8, 8), width=240, height=80, budget_ms=1000 / 60):
+        """Stacked per-phase bar graph of recent frames, with the frame budget line.
+
+        The graph lives on its own surface that scrolls left by one column
+        per new frame, so only the newest frames' bars are drawn each time.
+        """
+        if not self.enabled or not self.show_overlay:
+            return
+        graph = self.graph
+        if graph is None or graph.get_size() != (width, height):
+            graph = self.graph = pygame.Surface((width, height))
+            graph.fill((0, 0, 0))
+            self.graph_frames = max(self.frames - width, 0)
+
+        new = min(self.frames - self.graph_frames, width)
+        if new:
+            graph.scroll(-new, 0)
+            graph.fill((0, 0, 0), (width - new, 0, new, height))
+            # Frame budget sits at 2/3 of the graph height
+            scale = height * 2 / 3 / (budget_ms * 1e6)
+            rows = np.arange(self.frames - new, self.frames) % self.capacity
+            for column, frame in enumerate(self.durations[rows].tolist()):
+                x = width - new + column
+                y = height
+                for phase, ns in enumerate(frame):
+                    if ns:
+                        top = max(y - int(ns * scale), 0)
+                        graph.fill(PHASE_COLORS[phase % len(PHASE_COLORS)], (x, top, 1, y - top))
+                        y = top
+            budget_y = height - int(budget_ms * 1e6 * scale)
+            graph.fill((255, 255, 255), (width - new, budget_y, new, 1))
+            self.graph_frames = self.frames
+        surface.blit(graph, pos)
+
+    def chrome_trace(self):
+        """Return the recorded frames as a Chrome trace-event dict."""
+        events = []
+        frame_starts, durations = self.recent()
+        for start, frame in zip(frame_starts.tolist(), durations.tolist()):
+            ts = start / 1000.0
+            events.append({"name": "frame", "ph": "X", "pid": 0, "tid": 0,
+                           "ts": ts, "dur": sum(frame) / 1000.0})
+            for phase, ns in zip(self.phases, frame):
+                if ns:
+                    events.append({"name": phase, "ph": "X", "pid": 0, "tid": 1,
+                                   "ts": ts, "dur": ns / 1000.0})
+                    ts += ns / 1000.0
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+
+import numpy as np
+
+# The adaptive margin stays between these (ns)
+MIN_MARGIN = 200_000
+MAX_MARGIN = 4_000_000
+# Each frame the margin shrinks by this factor towards what sleeps overshoot
+MARGIN_DECAY = 0.99
+# A frame handed over later than this past its deadline counts as missed (ns)
+LATE_TOLERANCE = 500_000
+
+# Spinning gives up the CPU (and the GIL, for background threads) between
+# checks; sched_yield returns in about a microsecond where it exists
+_yield = getattr(os, "sched_yield", None) or (lambda: time.sleep(0))
+
+
+# --- Frame Scheduler ---
+class FrameScheduler:
+    """Paces a loop to fps with time.perf_counter_ns deadlines.
+
+    pygame.time.Clock.tick() sleeps in whole milliseconds and lands
+    wherever the OS wakes it. tick() here sleeps until `margin` before the
+    deadline and spins the rest, so frames end within microseconds of
+    their deadline. The margin adapts to how late sleeps actually wake
+    (the worst recent overshoot, decaying), so the spin stays a sliver of
+    the frame instead of a busy core.
+
+    Deadlines are absolute (the previous deadline plus one period), so a
+    slow frame doesn't push every later one back; a loop more than a
+    whole frame late starts over from now instead of racing to catch up.
+
+    Frame times (between tick() returns) go into a histogram of
+    bin_ms-wide bins; stats() and report() summarize it along with missed
+    deadlines and how much time went to spinning.
+    """
+
+    def __init__(self, fps, histogram_ms=50, bin_ms=0.1):
+        self.period = round(1e9 / fps)
+        self.margin = MIN_MARGIN * 5
+        self.bin = round(bin_ms * 1e6)
+        self.histogram = np.zeros(round(histogram_ms / bin_ms) + 1, dtype=np.int64) # last bin: longer
+        self.deadline = None
+        self.last = None
+        self.frames = 0      # frame times recorded
+        self.total = 0       # their sum (ns)
+        self.squares = 0.0   # sum of their squares, for the deviation
+        self.longest = 0
+        self.missed = 0      # deadlines handed over more than LATE_TOLERANCE late
+        self.spin = 0        # ns spent spinning
+        self.started = None
+
+    def tick(self):
+        """Wait for the next frame deadline.
+
+        Returns the milliseconds since the previous tick(), like
+        Clock.tick().
+        """
+        now = time.perf_counter_ns()
+        if self.deadline is None:
+            self.deadline = now + self.period
+            self.last = self.started = now
+            return 0
+        deadline = self.deadline
+        remaining = deadline - now
+        if remaining > 0:
+            sleep = remaining - self.margin
+            if sleep > 0:
+                time.sleep(sleep / 1e9)
+                woke = time.perf_counter_ns()
+                self._adapt(woke - now - sleep)
+                now = woke
+            spin_start = now
+            while now < deadline: # Spin out the tail
+                _yield()
+                now = time.perf_counter_ns()
+            self.spin += now - spin_start
+
+        late = now - deadline
+        if late > LATE_TOLERANCE:
+            self.missed += 1
+        if late > self.period: # Hopelessly behind: pace from here on
+            deadline = now
+        self.deadline = deadline + self.period
+
+        frame = now - self.last
+        self.last = now
+        self._record(frame)
+        return frame / 1e6
+
+    def _adapt(self, overshoot):
+        self.margin = min(max(self.margin * MARGIN_DECAY, overshoot * 1.5, MIN_MARGIN), MAX_MARGIN)
+
+    def _record(self, frame):
+        self.histogram[min(frame // self.bin, len(self.histogram) - 1)] += 1
+        self.frames += 1
+        self.total += frame
+        self.squares += frame * frame
+        if frame > self.longest:
+            self.longest = frame
+
+    def percentile(self, fraction):
+        """Frame time in ms that fraction of frames came in under (bin resolution)."""
+        if not self.frames:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.histogram), fraction * self.frames))
+        return (index + 1) * self.bin / 1e6
+
+    def stats(self):
+        """Frame pacing so far, times in milliseconds."""
+        frames = self.frames
+        mean = self.total / frames if frames else 0.0
+        deviation = max(self.squares / frames - mean * mean, 0.0) ** 0.5 if frames else 0.0
+        elapsed = (self.last - self.started) if frames else 0
+        return {
+            "frames": frames,
+            "target_ms": self.period / 1e6,
+            "mean_ms": mean / 1e6,
+            "stdev_ms": deviation / 1e6,
+            "p50_ms": self.percentile(0.50),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.longest / 1e6,
+            "missed": self.missed,
+            "margin_ms": self.margin / 1e6,
+            "spin_fraction": self.spin / elapsed if elapsed else 0.0,
+            "histogram_bin_ms": self.bin / 1e6,
+            "histogram": self.histogram.tolist(),
+        }
+
+    def dump_stats(self, path):
+        with open(path, "w") as f:
+            json.dump(self.stats(), f)
+
+    def report(self):
+        """One line: how evenly frames came and what it cost."""
+        stats = self.stats()
+        return ("%d frames at %.2f ms: mean %.3f ms, stdev %.3f ms, p99 %.1f ms, max %.1f ms, "
+                "%d missed deadlines, %.1f%% of the time spinning (margin %.2f ms)"
+                % (stats["frames"], stats["target_ms"], stats["mean_ms"], stats["stdev_ms"],
+                   stats["p99_ms"], stats["max_ms"], stats["missed"],
+                   stats["spin_fraction"] * 100, stats["margin_ms"]))
@@ -0,0 +1,48 @@
+import pygame
+
+
+def parse_spec(spec, default_scale=3):
+    """Parse "WxH" or "WxHxS" (e.g. "240x160x3") into ((W, H), S)."""
+    numbers = [int(n) for n in spec.lower().split("x")]
+    if len(numbers) == 2:
+        numbers.append(default_scale)
+    if len(numbers) != 3 or min(numbers) < 1:
+        raise ValueError("framebuffer spec must look like 240x160 or 240x160x3, got %r" % spec)
+    return (numbers[0], numbers[1]), numbers[2]
+
+
+# --- Low-Res Framebuffer ---
+class Framebuffer:
+    """An offscreen surface at the game's native resolution.
+
+    The game draws into `surface` at e.g. 240x160, so every fill and blit
+    touches scale^2 times fewer pixels, and present() blows it up to the
+    window with one nearest-neighbor scale by the largest integer factor
+    that fits. Whatever is left of the window around it stays black.
+    """
+
+    def __init__(self, size, window):
+        self.size = size
+        self.surface = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+        self.resize(window)
+
+    def resize(self, window):
+        """Fit the framebuffer to a (new) window surface."""
+        width, height = self.size
+        self.scale = max(min(window.get_width() // width, window.get_height() // height), 1)
+        area = pygame.Rect(0, 0, width * self.scale, height * self.scale)
+        area.center = window.get_rect().center
+        area = area.clip(window.get_rect())
+        window.fill((0, 0, 0))
+        self.window = window
+        self.area = area
+        self.target = window.subsurface(area)
+
+    def present(self):
+        """Copy the framebuffer to the window, scaled up."""
+        if self.scale == 1:
+            self.target.blit(self.surface, (0, 0))
+        else:
+            pygame.transform.scale(self.surface, self.target.get_size(), self.target)
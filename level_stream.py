@@ -0,0 +1,185 @@
+"""Compact binary tile-map levels, read through a memory map.
+
+File layout (all little-endian):
+
+    header        HEADER struct (see below)
+    chunk table   (chunk_count + 1) x uint32: first enemy index of each chunk
+    tiles         width x height bytes, column-major (one column = height bytes)
+    enemies       enemy_count x ENEMY struct (x, y, move_range), sorted by x
+
+Tiles are stored by column so the columns under the camera are one
+contiguous slice of the map, and enemies are grouped by chunk through the
+chunk table, so loading a chunk never touches the rest of the file.
+"""
+import mmap
+import random
+import struct
+
+MAGIC = b"SSLV"
+VERSION = 1
+
+# magic, version, tile size, width/height in tiles, chunk width in tiles,
+# enemy count, player start x/y in pixels
+HEADER = struct.Struct("<4sHHIHHIii")
+ENEMY = struct.Struct("<iii")
+CHUNK_ENTRY = struct.Struct("<I")
+
+# Tile codes
+TILE_EMPTY = 0
+TILE_PLATFORM = 1
+TILE_COIN_BLOCK = 2
+TILE_USED = 3
+
+
+def write_level(path, tiles, enemies, tile_size=20, chunk_cols=16, start=(50, 300)):
+    """Write a level file.
+
+    tiles is a list of columns, each a bytes-like of tile codes (top row
+    first); enemies is a list of (x, y, move_range) in pixels.
+    """
+    width = len(tiles)
+    height = len(tiles[0]) if tiles else 0
+    chunk_px = chunk_cols * tile_size
+    chunk_count = (width + chunk_cols - 1) // chunk_cols
+    enemies = sorted(enemies)
+
+    # First enemy index of every chunk, plus an end marker
+    table = []
+    i = 0
+    for chunk in range(chunk_count + 1):
+        while i < len(enemies) and enemies[i][0] // chunk_px < chunk:
+            i += 1
+        table.append(i)
+    table[-1] = len(enemies)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, tile_size, width, height,
+                            chunk_cols, len(enemies), start[0], start[1]))
+        for first in table:
+            f.write(CHUNK_ENTRY.pack(first))
+        for column in tiles:
+            f.write(bytes(column))
+        for enemy in enemies:
+            f.write(ENEMY.pack(*enemy))
+
+
+def generate_level(path, width_px, seed=0, tile_size=20, height_px=400,
+                   enemy_every=300, chunk_cols=16):
+    """Write a random but playable level of roughly width_px pixels.
+
+    Solid ground two tiles deep with occasional gaps, floating platforms,
+    coin blocks and a patrolling enemy about every enemy_every pixels.
+    """
+    rnd = random.Random(seed)
+    width = max(width_px // tile_size, 1)
+    height = height_px // tile_size
+    ground_row = height - 2
+    columns = [bytearray(height) for _ in range(width)]
+
+    for col in range(width):
+        if col < 10 or rnd.random() > 0.03: # Keep the start solid
+            columns[col][ground_row] = TILE_PLATFORM
+            columns[col][ground_row + 1] = TILE_PLATFORM
+
+    col = 8
+    while col < width - 6:
+        row = rnd.randrange(ground_row - 9, ground_row - 3)
+        length = rnd.randrange(2, 7)
+        for c in range(col, min(col + length, width)):
+            columns[c][row] = TILE_PLATFORM
+        if rnd.random() < 0.3:
+            columns[col][row - 4] = TILE_COIN_BLOCK
+        col += length + rnd.randrange(3, 10)
+
+    enemies = []
+    for x in range(enemy_every, width * tile_size - 200, enemy_every):
+        enemies.append((x + rnd.randrange(0, 100), ground_row * tile_size - 20,
+                        rnd.randrange(40, 160)))
+
+    write_level(path, columns, enemies, tile_size, chunk_cols,
+                start=(50, ground_row * tile_size - 40))
+
+
+# --- Level File ---
+class LevelFile:
+    """A level file opened through mmap. Only the chunks asked for are read."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.tile_size, self.width, self.height,
+         self.chunk_cols, self.enemy_count, start_x, start_y) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a version %d level file" % (path, VERSION))
+        self.start = (start_x, start_y)
+        self.chunk_count = (self.width + self.chunk_cols - 1) // self.chunk_cols
+        self.chunk_px = self.chunk_cols * self.tile_size
+        self.width_px = self.width * self.tile_size
+        self.height_px = self.height * self.tile_size
+
+        self.table_offset = HEADER.size
+        self.tiles_offset = self.table_offset + (self.chunk_count + 1) * CHUNK_ENTRY.size
+        self.enemies_offset = self.tiles_offset + self.width * self.height
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def positions(self, code):
+        """Yield (column, row) of every tile with code, column by column."""
+        byte = bytes((code,))
+        end = self.enemies_offset
+        i = self.map.find(byte, self.tiles_offset, end)
+        while i >= 0:
+            yield divmod(i - self.tiles_offset, self.height)
+            i = self.map.find(byte, i + 1, end)
+
+    def chunk_columns(self, chunk):
+        """Return (first column, column count) of a chunk."""
+        first = chunk * self.chunk_cols
+        return first, min(self.chunk_cols, self.width - first)
+
+    def chunk_tiles(self, chunk):
+        """Return the raw column-major tile bytes of a chunk."""
+        first, count = self.chunk_columns(chunk)
+        start = self.tiles_offset + first * self.height
+        return self.map[start:start + count * self.height]
+
+    def chunk_runs(self, chunk, overrides=None):
+        """Yield (x, y, w, h, tile) rects for the solid tiles of a chunk.
+
+        Horizontal runs of plain platform tiles are merged into one rect;
+        coin blocks and used blocks stay one tile each. overrides maps
+        (column, row) to a tile code that replaces what is in the file.
+        """
+        first, count = self.chunk_columns(chunk)
+        height = self.height
+        size = self.tile_size
+        tiles = self.chunk_tiles(chunk)
+        if overrides:
+            tiles = bytearray(tiles)
+            for (col, row), tile in overrides.items():
+                if first <= col < first + count:
+                    tiles[(col - first) * height + row] = tile
+
+        for row in range(height):
+            run_start = None
+            for c in range(count + 1):
+                tile = tiles[c * height + row] if c < count else TILE_EMPTY
+                if tile == TILE_PLATFORM:
+                    if run_start is None:
+                        run_start = c
+                    continue
+                if run_start is not None:
+                    yield ((first + run_start) * size, row * size,
+                           (c - run_start) * size, size, TILE_PLATFORM)
+                    run_start = None
+                if tile != TILE_EMPTY:
+                    yield (first + c) * size, row * size, size, size, tile
+
+    def chunk_enemies(self, chunk):
+        """Yield (index, x, y, move_range) for the enemies spawned in a chunk."""
+        first = CHUNK_ENTRY.unpack_from(self.map, self.table_offset + chunk * CHUNK_ENTRY.size)[0]
+        end = CHUNK_ENTRY.unpack_from(self.map, self.table_offset + (chunk + 1) * CHUNK_ENTRY.size)[0]
+        for index in range(first, end):
+            yield (index,) + ENEMY.unpack_from(self.map, self.enemies_offset + index * ENEMY.size)
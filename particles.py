@@ -0,0 +1,149 @@
+import math
+
+import numpy as np
+import pygame
+
+from engine import BROWN, GRAVITY
+from surface_pool import SURFACE_POOL
+
+# Side of a particle's square, in pixels
+PARTICLE_SIZE = 2
+
+# Effect colors
+DUST = (225, 225, 225)  # Head bonks
+SPARK = (255, 230, 90)  # Coin blocks
+
+
+# --- Particle System ---
+class ParticleSystem:
+    """Short-lived debris and sparks, every particle a slot in NumPy arrays.
+
+    A slot is a position, a velocity, the frames it has left (0 = free)
+    and a palette index. Free slots sit on a stack, so a burst takes what
+    earlier bursts left behind instead of allocating; a burst bigger than
+    what's free is cut short, so a flood of effects costs at most
+    `capacity` particles. update() moves and ages every slot in a few
+    array operations (falling by GRAVITY like everything else) and
+    returns the expired ones to the stack. draw() writes the visible
+    particles straight into the surface's pixels in one surfarray pass.
+
+    Particles are only for show: World snapshots and replays ignore them.
+    """
+
+    def __init__(self, capacity=65536, seed=0):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.int32)  # frames left, 0 = free slot
+        self.color = np.zeros(capacity, dtype=np.uint8) # index into palette
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int32) # stack, low slots on top
+        self.free_count = capacity
+        self.high = 0      # slots from here up have never been used
+        self.palette = []  # color index -> (r, g, b)
+        self.palette_index = {}
+        self.random = np.random.default_rng(seed)
+
+    def __len__(self):
+        """Live particles."""
+        return self.capacity - self.free_count
+
+    def _color(self, color):
+        key = tuple(color)
+        index = self.palette_index.get(key)
+        if index is None:
+            if len(self.palette) > 255:
+                raise ValueError("a ParticleSystem holds at most 256 colors")
+            index = self.palette_index[key] = len(self.palette)
+            self.palette.append(key)
+        return index
+
+    def burst(self, rect, count, color, speed, life, angle=-math.pi / 2, spread=math.pi / 2):
+        """Throw up to count particles out of rect.
+
+        Each starts somewhere in rect at up to speed pixels per frame,
+        heading within spread radians either side of angle (default:
+        anywhere upwards), and lives between life / 2 and life frames.
+        """
+        count = min(count, self.free_count)
+        if not count:
+            return
+        top = self.free_count
+        self.free_count -= count
+        slots = self.free[top - count:top]
+        x, y, w, h = rect
+        rnd = self.random
+        heading = rnd.uniform(angle - spread, angle + spread, count)
+        velocity = rnd.uniform(0.3 * speed, speed, count)
+        self.x[slots] = rnd.uniform(x, x + w, count)
+        self.y[slots] = rnd.uniform(y, y + h, count)
+        self.vx[slots] = np.cos(heading) * velocity
+        self.vy[slots] = np.sin(heading) * velocity
+        self.life[slots] = rnd.integers(max(life // 2, 1), life + 1, count)
+        self.color[slots] = self._color(color)
+        self.high = max(self.high, int(slots.max()) + 1)
+
+    # --- Effects ---
+    def stomp(self, rect):
+        """An enemy squashed: its pieces fly up and out."""
+        self.burst(rect, 40, BROWN, 5, 40)
+
+    def bonk(self, rect):
+        """A head hit a block: dust off the top of rect."""
+        self.burst((rect[0], rect[1], rect[2], 2), 12, DUST, 2, 20, angle=math.pi / 2, spread=1.2)
+
+    def coin_block(self, rect):
+        """A coin block used up: sparks off its top."""
+        self.burst((rect[0], rect[1] - 2, rect[2], 2), 60, SPARK, 6, 45)
+
+    # --- Simulation ---
+    def update(self):
+        """Advance every particle one frame and free the expired ones."""
+        n = self.high
+        if not n:
+            return
+        life = self.life[:n]
+        vy = self.vy[:n]
+        vy += GRAVITY
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += vy
+        expired = np.flatnonzero(life == 1)
+        np.subtract(life, 1, out=life, where=life > 0)
+        if len(expired):
+            self.free[self.free_count:self.free_count + len(expired)] = expired
+            self.free_count += len(expired)
+        if self.free_count == self.capacity:
+            # All free again: restack so bursts fill the low slots first
+            self.free[:] = np.arange(self.capacity - 1, -1, -1, dtype=np.int32)
+            self.high = 0
+
+    def draw(self, surface, camera_x=0, camera_y=0):
+        """Draw every live particle the camera sees onto surface."""
+        n = self.high
+        if not n:
+            return
+        live = np.flatnonzero(self.life[:n])
+        if not len(live):
+            return
+        size = PARTICLE_SIZE
+        width, height = surface.get_size()
+        xs = np.floor(self.x[live] - camera_x).astype(np.int32)
+        ys = np.floor(self.y[live] - camera_y).astype(np.int32)
+        inside = (xs >= 0) & (xs <= width - size) & (ys >= 0) & (ys <= height - size)
+        xs = xs[inside]
+        ys = ys[inside]
+        colors = self.color[live[inside]]
+        try:
+            pixels = pygame.surfarray.pixels2d(surface)
+        except ValueError: # No 2D pixel view at this depth (24 bit): blit instead
+            images = [SURFACE_POOL.solid((size, size), color) for color in self.palette]
+            surface.blits([(images[c], (x, y))
+                           for c, x, y in zip(colors.tolist(), xs.tolist(), ys.tolist())], False)
+            return
+        mapped = np.array([surface.map_rgb(color) for color in self.palette], dtype=np.int64)
+        values = mapped[colors].astype(pixels.dtype)
+        for dx in range(size):
+            for dy in range(size):
+                pixels[xs + dx, ys + dy] = values
+        del pixels # Unlocks the surface
@@ -0,0 +1,519 @@
+"""Reinforcement-learning style environments over the HDR platformer.
+
+PlatformerEnv drives one samsofthdr.World (the real Player/Enemy/Platform
+sprites). VectorPlatformerEnv steps N copies of a tile-map level in
+lock-step with all state held in NumPy arrays, for throughput; run
+
+    python platformer_env.py [level.lvl]
+
+to check it against PlatformerEnv with tile collision. Both use the same
+actions, observations and rewards:
+
+    action       int 0..7, a samsofthdr INPUT_* bitmask (LEFT=1, RIGHT=2, JUMP=4)
+    observation  float32 vector of OBSERVATION_SIZE (see observation layout)
+    reward       progress to the right, +1 per stomp / coin block, -5 per death
+    done         reached the end of the level, or max_frames elapsed
+
+Observation layout: player x (fraction of the level), y, vel_x, vel_y,
+on_ground, is_super; a PATCH_COLS x PATCH_ROWS window of tile codes around
+the player (0 empty, 1 platform, 2 coin block, 3 used, divided by 3); then
+dx, dy of the NEAREST_ENEMIES closest living enemies less than ENEMY_SIGHT
+pixels away sideways (0, 0 when absent; ties go to the lower spawn index).
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import samsofthdr as game
+from level_stream import (LevelFile, TILE_COIN_BLOCK, TILE_EMPTY, TILE_PLATFORM,
+                          TILE_USED, generate_level)
+
+PATCH_COLS = 7
+PATCH_ROWS = 5
+NEAREST_ENEMIES = 4
+# Enemies farther than this (sideways, in pixels) aren't observed. A World
+# always has this much around the player streamed in, so both envs see the
+# same enemies (for patrols shorter than samsofthdr.STREAM_MARGIN - ENEMY_SIGHT)
+ENEMY_SIGHT = 400
+OBSERVATION_SIZE = 6 + PATCH_COLS * PATCH_ROWS + 2 * NEAREST_ENEMIES
+ACTION_COUNT = 8
+
+# Reward shaping
+PROGRESS_REWARD = 0.01 # per pixel of new ground covered
+EVENT_REWARD = 1.0     # per stomp or coin block
+DEATH_PENALTY = -5.0
+
+TILE_CODES = {'platform': TILE_PLATFORM, 'coin_block': TILE_COIN_BLOCK, 'used': TILE_USED}
+
+SMALL_HEIGHT = 30
+SUPER_HEIGHT = 40
+PLAYER_WIDTH = 20
+ENEMY_SIZE = 20
+MAX_FALL = 10 # Player's terminal velocity
+
+
+def _round(values):
+    """Round half away from zero, the way pygame.Rect stores floats."""
+    return np.trunc(values + np.copysign(0.5, values)).astype(np.int64)
+
+
+# --- Single environment ---
+class PlatformerEnv:
+    """One World with reset()/step(action). level_path None plays the demo
+    level; collision is the World's collision mode."""
+
+    observation_size = OBSERVATION_SIZE
+    action_count = ACTION_COUNT
+
+    def __init__(self, level_path=None, max_frames=3600, collision="rects"):
+        self.level_path = level_path
+        self.max_frames = max_frames
+        self.collision = collision
+        self.world = None
+
+    def reset(self):
+        if self.world is not None and self.world.level is not None:
+            self.world.level.close()
+        level = LevelFile(self.level_path) if self.level_path else None
+        self.world = game.World(level, collision=self.collision)
+        self.best_x = self.world.player.rect.x
+        self.events = 0
+        return self.observation()
+
+    def step(self, action):
+        world = self.world
+        deaths = world.deaths
+        events = len(world.killed_spawns) + len(world.used_corners)
+        world.step(int(action))
+
+        player = world.player
+        reward = 0.0
+        if player.rect.x > self.best_x:
+            reward += (player.rect.x - self.best_x) * PROGRESS_REWARD
+            self.best_x = player.rect.x
+        reward += (len(world.killed_spawns) + len(world.used_corners) - events) * EVENT_REWARD
+        reward += (world.deaths - deaths) * DEATH_PENALTY
+
+        completed = player.rect.x >= world.level_width - player.rect.width
+        done = completed or world.frame >= self.max_frames
+        info = {"completed": completed, "deaths": world.deaths, "frames": world.frame}
+        return self.observation(), reward, done, info
+
+    def observation(self):
+        world = self.world
+        player = world.player
+        obs = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        obs[:6] = (player.rect.x / world.level_width, player.rect.y / game.SCREEN_HEIGHT,
+                   player.vel_x / game.PLAYER_SPEED, player.vel_y / 10,
+                   player.on_ground, player.is_super)
+
+        # Rasterize the platforms around the player into the tile patch
+        size = world.level.tile_size if world.level is not None else 20
+        col0 = player.rect.centerx // size - PATCH_COLS // 2
+        row0 = player.rect.centery // size - PATCH_ROWS // 2
+        area = pygame.Rect(col0 * size, row0 * size, PATCH_COLS * size, PATCH_ROWS * size)
+        patch = np.zeros((PATCH_COLS, PATCH_ROWS), dtype=np.float32)
+        for platform in world.platform_list.query(area):
+            clip = platform.rect.clip(area)
+            if clip.width and clip.height:
+                c0 = (clip.left - area.left) // size
+                c1 = (clip.right - 1 - area.left) // size
+                r0 = (clip.top - area.top) // size
+                r1 = (clip.bottom - 1 - area.top) // size
+                patch[c0:c1 + 1, r0:r1 + 1] = TILE_CODES[platform.type] / 3
+        obs[6:6 + patch.size] = patch.ravel()
+
+        enemies = world.enemy_list
+        # Enemies out of the camera's range sleep: bring the ones in sight up to date
+        alive = np.array(sorted(enemies.reaching(player.rect.x - ENEMY_SIGHT,
+                                                 player.rect.x + ENEMY_SIGHT)), dtype=np.int64)
+        enemies.catch_up(alive[~enemies.awake[alive]])
+        alive = alive[np.abs(enemies.x[alive] - player.rect.x) < ENEMY_SIGHT]
+        if len(alive):
+            dx = enemies.x[alive] - player.rect.x
+            dy = enemies.y[alive] - player.rect.y
+            spawns = [enemies.slot_sprites[i].spawn_index for i in alive.tolist()]
+            nearest = np.lexsort((spawns, np.abs(dx)))[:NEAREST_ENEMIES]
+            pairs = np.stack([dx[nearest], dy[nearest]], axis=1) / 100.0
+            obs[6 + patch.size:6 + patch.size + pairs.size] = pairs.ravel()
+        return obs
+
+
+# --- Vectorized environment ---
+class VectorPlatformerEnv:
+    """N independent copies of one tile-map level, stepped in lock-step.
+
+    Plays exactly like a World with collision="tiles" (Player.update and
+    move_on_tiles, enemy patrols, falls, stomps and damage) but on NumPy
+    arrays. Every enemy of the level patrols from frame 0, which is where
+    a World's streamed-in and sleeping enemies are caught up to. Enemies
+    touching the player in the same frame are handled one at a time in
+    spawn order, like World.step. compare_with_world() checks all of this
+    step for step.
+
+    Finished environments are reset automatically; step() reports their
+    final stats in info.
+    """
+
+    observation_size = OBSERVATION_SIZE
+    action_count = ACTION_COUNT
+
+    def __init__(self, level_path, num_envs, max_frames=3600):
+        level = LevelFile(level_path)
+        self.num_envs = num_envs
+        self.max_frames = max_frames
+        self.tile_size = level.tile_size
+        self.level_width = level.width_px
+        self.start = level.start
+        self.cols = level.width
+        self.rows = level.height
+        # How many tiles the player can span, and its leading edge cross in
+        # one step, at this tile size
+        size = level.tile_size
+        self.player_cols = (PLAYER_WIDTH - 1) // size + 2
+        self.player_rows = (SUPER_HEIGHT - 1) // size + 2
+        self.sideways_reach = (game.PLAYER_SPEED - 1) // size + 2
+        self.vertical_reach = (max(-game.JUMP_STRENGTH, MAX_FALL) - 1) // size + 2
+
+        # The level's tiles, column-major like the file: [column, row]
+        self.level_tiles = np.frombuffer(
+            level.map[level.tiles_offset:level.tiles_offset + level.width * level.height],
+            dtype=np.uint8).reshape(level.width, level.height).copy()
+        spawns = [spawn[1:] for chunk in range(level.chunk_count)
+                  for spawn in level.chunk_enemies(chunk)]
+        self.spawns = np.array(spawns, dtype=np.int64).reshape(-1, 3)
+        level.close()
+
+        n = num_envs
+        e = len(self.spawns)
+        self.tiles = np.empty((n, self.cols, self.rows), dtype=np.uint8)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.vel_x = np.zeros(n, dtype=np.int64)
+        self.vel_y = np.zeros(n, dtype=np.float64)
+        self.on_ground = np.zeros(n, dtype=bool)
+        self.is_super = np.zeros(n, dtype=bool)
+        self.is_invincible = np.zeros(n, dtype=bool)
+        self.invincible_timer = np.zeros(n, dtype=np.int64)
+        self.enemy_x = np.zeros((n, e), dtype=np.int64)
+        self.enemy_dir = np.zeros((n, e), dtype=np.int64)
+        self.enemy_alive = np.zeros((n, e), dtype=bool)
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.deaths = np.zeros(n, dtype=np.int64)
+        self.best_x = np.zeros(n, dtype=np.int64)
+        self.env_index = np.arange(n)
+
+    # --- Helpers ---
+    def height(self):
+        return np.where(self.is_super, SUPER_HEIGHT, SMALL_HEIGHT)
+
+    def solid_in_rows(self, cols, row0, row1):
+        """Whether column cols has a solid tile in rows row0..row1, per env."""
+        solid = np.zeros(self.num_envs, dtype=bool)
+        for k in range(self.player_rows):
+            rows = row0 + k
+            solid |= (rows <= row1) & (self.tile_at(cols, rows) != TILE_EMPTY)
+        return solid
+
+    def tile_at(self, cols, rows):
+        """Tile codes at (cols, rows) per env; outside the grid counts as empty."""
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        codes = self.tiles[self.env_index, np.clip(cols, 0, self.cols - 1),
+                           np.clip(rows, 0, self.rows - 1)]
+        return np.where(inside, codes, TILE_EMPTY)
+
+    def reset_envs(self, mask):
+        """Put the masked environments back at the start of a fresh level."""
+        if not mask.any():
+            return
+        self.tiles[mask] = self.level_tiles
+        self.x[mask] = self.start[0]
+        self.y[mask] = self.start[1]
+        self.vel_x[mask] = 0
+        self.vel_y[mask] = 0
+        self.on_ground[mask] = False
+        self.is_super[mask] = False
+        self.is_invincible[mask] = False
+        self.invincible_timer[mask] = 0
+        self.enemy_x[mask] = self.spawns[:, 0]
+        self.enemy_dir[mask] = game.ENEMY_SPEED
+        self.enemy_alive[mask] = True
+        self.frames[mask] = 0
+        self.deaths[mask] = 0
+        self.best_x[mask] = self.start[0]
+
+    def reset(self):
+        self.reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self.observation()
+
+    def respawn(self, mask):
+        """Player.reset() for the masked envs (after a fall or a fatal hit)."""
+        # Player.reset puts the super rect at the start, then shrinks it
+        # keeping its bottom, so a super player lands 10px lower
+        offset = np.where(self.is_super, SUPER_HEIGHT - SMALL_HEIGHT, 0)
+        self.x = np.where(mask, self.start[0], self.x)
+        self.y = np.where(mask, self.start[1] + offset, self.y)
+        self.vel_x[mask] = 0
+        self.vel_y[mask] = 0
+        self.on_ground[mask] = False
+        was_super = mask & self.is_super
+        self.invincible_timer[was_super] = game.FPS * 2
+        self.is_super[mask] = False
+        self.is_invincible[was_super] = False
+        self.deaths += mask
+
+    # --- Step ---
+    def step(self, actions):
+        actions = np.asarray(actions)
+        size = self.tile_size
+        w = PLAYER_WIDTH
+        n = self.num_envs
+
+        # --- Handle Input ---
+        vel_x = np.where(actions & game.INPUT_LEFT, -game.PLAYER_SPEED, 0)
+        vel_x = np.where(actions & game.INPUT_RIGHT, game.PLAYER_SPEED, vel_x)
+        self.vel_x = vel_x
+        jump = ((actions & game.INPUT_JUMP) != 0) & self.on_ground
+        vel_y = np.where(jump, float(game.JUMP_STRENGTH), self.vel_y)
+        self.on_ground &= ~jump
+
+        # --- Apply Physics ---
+        falling = ~self.on_ground
+        vel_y = np.where(falling, np.minimum(vel_y + game.GRAVITY, MAX_FALL), vel_y)
+
+        # Horizontal movement and collision, like Player.move_on_tiles: the
+        # first solid column the leading edge crosses, across the player's rows
+        h = self.height()
+        old_x = self.x
+        x = old_x + vel_x
+        y = self.y
+        row0 = y // size
+        row1 = (y + h - 1) // size
+        right = vel_x > 0
+        left = vel_x < 0
+        first = np.where(right, (old_x + w) // size, (old_x - 1) // size)
+        last = np.where(right, (x + w - 1) // size, x // size)
+        step = np.where(right, 1, -1)
+        found = np.zeros(n, dtype=bool)
+        hit = np.zeros(n, dtype=np.int64)
+        for k in range(self.sideways_reach):
+            cols = first + k * step
+            crossed = (right & (cols <= last)) | (left & (cols >= last))
+            solid = self.solid_in_rows(cols, row0, row1)
+            new = crossed & solid & ~found
+            hit = np.where(new, cols, hit)
+            found |= new
+        x = np.where(found & right, hit * size - w, x)
+        x = np.where(found & left, (hit + 1) * size, x)
+
+        # Vertical movement and collision: the first solid row the leading
+        # edge crosses, across the player's columns
+        old_y = y
+        y = _round(y + vel_y)
+        col0 = x // size
+        col1 = (x + w - 1) // size
+        down = y > old_y
+        up = y < old_y
+        first = np.where(down, (old_y + h) // size, (old_y - 1) // size)
+        last = np.where(down, (y + h - 1) // size, y // size)
+        step = np.where(down, 1, -1)
+        found = np.zeros(n, dtype=bool)
+        hit = np.zeros(n, dtype=np.int64)
+        for k in range(self.vertical_reach):
+            rows = first + k * step
+            crossed = (down & (rows <= last)) | (up & (rows >= last))
+            solid = np.zeros(n, dtype=bool)
+            for j in range(self.player_cols):
+                cols = col0 + j
+                solid |= (cols <= col1) & (self.tile_at(cols, rows) != TILE_EMPTY)
+            new = crossed & solid & ~found
+            hit = np.where(new, rows, hit)
+            found |= new
+        landed = found & down
+        bonked = found & up
+        y = np.where(landed, hit * size - h, y)
+        y = np.where(bonked, (hit + 1) * size, y)
+        vel_y = np.where(found, 0.0, vel_y)
+        self.on_ground = landed
+
+        # Coin blocks bonked from below turn "used" and make the player super
+        coins = np.zeros(n, dtype=np.int64)
+        for j in range(self.player_cols):
+            cols = col0 + j
+            coin = bonked & (cols <= col1) & (self.tile_at(cols, hit) == TILE_COIN_BLOCK)
+            if coin.any():
+                self.tiles[self.env_index[coin], cols[coin], hit[coin]] = TILE_USED
+                coins += coin
+        grow = (coins > 0) & ~self.is_super
+        y = np.where(grow, y - (SUPER_HEIGHT - SMALL_HEIGHT), y)
+        self.is_super |= grow
+
+        # Keep player within level bounds
+        x = np.clip(x, 0, self.level_width - w)
+        self.x, self.y, self.vel_y = x, y, vel_y
+
+        # Update invincibility timer
+        self.invincible_timer -= self.is_invincible
+        self.is_invincible &= self.invincible_timer > 0
+
+        # --- Enemy patrols ---
+        alive = self.enemy_alive
+        start_x = self.spawns[:, 0]
+        self.enemy_x += np.where(alive, self.enemy_dir, 0)
+        turn = ((self.enemy_x > start_x + self.spawns[:, 2]) | (self.enemy_x < start_x)) & alive
+        self.enemy_dir = np.where(turn, -self.enemy_dir, self.enemy_dir)
+
+        # --- Falls ---
+        fell = self.y > game.SCREEN_HEIGHT
+        self.respawn(fell)
+        deaths = fell.astype(np.int64)
+
+        # --- Enemy contact: stomp or damage ---
+        # The enemies touching the player are found once, then handled one
+        # at a time in spawn order, the way World.step does it
+        h = self.height()[:, None]
+        px = self.x[:, None]
+        py = self.y[:, None]
+        ey = self.spawns[:, 1]
+        touching = (alive & (self.enemy_x < px + w) & (self.enemy_x + ENEMY_SIZE > px)
+                    & (ey < py + h) & (ey + ENEMY_SIZE > py))
+        counts = touching.sum(axis=1)
+        order = np.argsort(~touching, axis=1, kind="stable")
+        stomps = np.zeros(n, dtype=np.int64)
+        for k in range(int(counts.max()) if touching.size else 0):
+            touched = counts > k
+            enemy = order[:, k]
+            bottom = self.y + self.height()
+            stomp = touched & (self.vel_y > 0) & (bottom < ey[enemy] + ENEMY_SIZE // 2 + 10)
+            self.enemy_alive[self.env_index[stomp], enemy[stomp]] = False
+            stomps += stomp
+            self.vel_y = np.where(stomp, -game.JUMP_STRENGTH / 2, self.vel_y)
+
+            hurt = touched & ~stomp & ~self.is_invincible
+            shrink = hurt & self.is_super
+            self.y = np.where(shrink, self.y + (SUPER_HEIGHT - SMALL_HEIGHT), self.y)
+            self.is_super &= ~shrink
+            self.is_invincible |= shrink
+            self.invincible_timer[shrink] = game.FPS * 2
+            killed = hurt & ~shrink
+            self.respawn(killed)
+            deaths += killed
+
+        # --- Rewards and episode ends ---
+        self.frames += 1
+        progress = np.maximum(self.x - self.best_x, 0)
+        self.best_x += progress
+        reward = (progress * PROGRESS_REWARD + (stomps + coins) * EVENT_REWARD
+                  + deaths * DEATH_PENALTY).astype(np.float32)
+        completed = self.x >= self.level_width - w
+        done = completed | (self.frames >= self.max_frames)
+        info = {"completed": completed, "deaths": self.deaths.copy(), "frames": self.frames.copy()}
+        self.reset_envs(done)
+        return self.observation(), reward, done, info
+
+    def observation(self):
+        n = self.num_envs
+        size = self.tile_size
+        obs = np.zeros((n, OBSERVATION_SIZE), dtype=np.float32)
+        h = self.height()
+        obs[:, 0] = self.x / self.level_width
+        obs[:, 1] = self.y / game.SCREEN_HEIGHT
+        obs[:, 2] = self.vel_x / game.PLAYER_SPEED
+        obs[:, 3] = self.vel_y / 10
+        obs[:, 4] = self.on_ground
+        obs[:, 5] = self.is_super
+
+        # Tile window around the player's center, column-major like PlatformerEnv
+        cols = ((self.x + PLAYER_WIDTH // 2) // size - PATCH_COLS // 2)[:, None, None] \
+            + np.arange(PATCH_COLS)[None, :, None]
+        rows = ((self.y + h // 2) // size - PATCH_ROWS // 2)[:, None, None] \
+            + np.arange(PATCH_ROWS)[None, None, :]
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        patch = self.tiles[self.env_index[:, None, None], np.clip(cols, 0, self.cols - 1),
+                           np.clip(rows, 0, self.rows - 1)]
+        patch = np.where(inside, patch, TILE_EMPTY)
+        end = 6 + PATCH_COLS * PATCH_ROWS
+        obs[:, 6:end] = patch.reshape(n, -1) / 3
+
+        if self.spawns.size:
+            dx = self.enemy_x - self.x[:, None]
+            dy = self.spawns[:, 1][None, :] - self.y[:, None]
+            seen = self.enemy_alive & (np.abs(dx) < ENEMY_SIGHT)
+            distance = np.where(seen, np.abs(dx), np.iinfo(np.int64).max)
+            k = min(NEAREST_ENEMIES, distance.shape[1])
+            nearest = np.argsort(distance, axis=1, kind="stable")[:, :k]
+            found = np.take_along_axis(seen, nearest, axis=1)
+            pairs = np.stack([np.take_along_axis(dx, nearest, axis=1),
+                              np.take_along_axis(dy, nearest, axis=1)], axis=2) / 100.0
+            pairs[~found] = 0
+            obs[:, end:end + 2 * k] = pairs.reshape(n, -1)
+        return obs
+
+
+# --- Equivalence check ---
+def compare_with_world(level_path, num_envs=32, frames=3000, seed=0, max_frames=1200):
+    """Step a VectorPlatformerEnv and num_envs tile-collision PlatformerEnvs
+    with the same random actions and compare them after every step.
+
+    Half the envs press random buttons, half mostly run right and jump.
+    Finished PlatformerEnvs are reset alongside the vector env's automatic
+    resets. Returns a list of (frame, env, what) mismatches, empty when
+    every observation, reward and done flag matched.
+    """
+    rng = np.random.default_rng(seed)
+    vector = VectorPlatformerEnv(level_path, num_envs, max_frames)
+    singles = [PlatformerEnv(level_path, max_frames, collision="tiles") for _ in range(num_envs)]
+    expected = np.array([env.reset() for env in singles])
+    observations = vector.reset()
+    mismatches = []
+    if not np.array_equal(observations, expected):
+        mismatches.append((0, None, "reset observation"))
+    runners = np.arange(num_envs) % 2 == 1
+    for frame in range(1, frames + 1):
+        actions = rng.integers(0, ACTION_COUNT, num_envs)
+        running = (game.INPUT_RIGHT | np.where(rng.random(num_envs) < 0.3, game.INPUT_JUMP, 0)
+                   | np.where(rng.random(num_envs) < 0.1, game.INPUT_LEFT, 0))
+        actions = np.where(runners, running, actions)
+        observations, rewards, dones, _ = vector.step(actions)
+        for i, env in enumerate(singles):
+            observation, reward, done, _ = env.step(int(actions[i]))
+            if done:
+                observation = env.reset()
+            for what, mine, theirs in (("observation", observations[i], observation),
+                                       ("reward", rewards[i], np.float32(reward)),
+                                       ("done", dones[i], done)):
+                if not np.array_equal(mine, theirs):
+                    mismatches.append((frame, i, what))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check VectorPlatformerEnv against World, step for step.")
+    parser.add_argument("level", nargs="?", help="tile-map level file (default: a generated one)")
+    parser.add_argument("--envs", type=int, default=32, help="environments to compare")
+    parser.add_argument("--frames", type=int, default=3000, help="steps to run")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the actions and the level")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        level_path = args.level
+        if level_path is None:
+            level_path = os.path.join(tmpdir, "level.lvl")
+            generate_level(level_path, 6000, seed=args.seed)
+        mismatches = compare_with_world(level_path, args.envs, args.frames, args.seed)
+    if mismatches:
+        for frame, env, what in mismatches[:10]:
+            print("MISMATCH frame %d env %s: %s" % (frame, env, what))
+        print("%d mismatches" % len(mismatches))
+        sys.exit(1)
+    print("%d envs x %d steps match World" % (args.envs, args.frames))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 import pygame
+import sys
 import textwrap
 import math  # Import the math module for the sine function
 
+from font_cache import FontCache
+from frame_scheduler import FrameScheduler
+from rotation_cache import RotationCache
+from text_cache import TextCache
+from trophy_catalog import Trophy, TrophyCatalog, TrophyLoader, render_art
+
 # --- Configuration ---
 SCREEN_WIDTH, SCREEN_HEIGHT = 600, 400
 BACKGROUND_COLOR = (20, 20, 40)  # Dark blue, Melee-like
@@ -9,6 +16,14 @@ TEXT_COLOR = (230, 230, 255)
 TITLE_COLOR = (255, 255, 100)
 FEATHER_BASE_WIDTH = 100  # Base width for the feather drawing
 FEATHER_BASE_HEIGHT = 200 # Base height for the feather drawing
+ROTATION_STEPS = 128  # Cached turntable frames per full rotation
+ROTATION_CACHE_BUDGET = 8 * 1024 * 1024  # Bytes of cached frames to keep
+PREBUILD_TURNTABLE = True  # Render every rotation frame at startup
+PREBUILD_IN_BACKGROUND = True  # ...on a background thread
+BAKE_TEXT_PANEL = True  # Render all the static text into one surface once
+FONT_CACHE_PATH = None  # Resolved font files; None = ~/.cache/samsoft/fonts.json
+LOADED_TROPHIES = 8  # Prepared trophies (art + turntable cache) kept around
+FLOAT_AMPLITUDE = 10  # How high and low the trophy bobs, in pixels
 
 # --- Trophy Details (Custom-written in Melee style) ---
 TROPHY_TITLE = "Cape Feather"
@@ -22,37 +37,54 @@ TROPHY_DESCRIPTION = (
 )
 TROPHY_GAME = "Appears in: Super Mario World"
 ROTATION_INSTRUCTION = "(Use Left/Right Arrows to Rotate)"
+BROWSE_INSTRUCTION = "Up/Down: browse   /: search"
+
 
+# Line breaks and rendered lines are cached, the text never changes
+TEXT_CACHE = TextCache()
 
 # --- Helper Function to Wrap Text ---
 def draw_text(surface, text, pos, font, color, max_width):
     """Draws text on a surface, wrapping it to a max width."""
-    words = text.split(' ')
-    lines = []
-    current_line = ""
-
-    for word in words:
-        test_line = current_line + word + " "
-        if font.size(test_line)[0] <= max_width:
-            current_line = test_line
-        else:
-            lines.append(current_line)
-            current_line = word + " "
-    
-    lines.append(current_line)
+    TEXT_CACHE.draw(surface, text, pos, font, color, max_width)
 
-    x, y = pos
-    for line in lines:
-        line_surface = font.render(line, True, color)
-        surface.blit(line_surface, (x, y))
-        y += font.get_linesize()
+# --- Helper Function to Draw the Trophy Text ---
+def draw_trophy_text(surface, x, title_font, body_font, instruction_font, trophy):
+    """Draws the title, description, game and instructions in a column at x."""
+    text_max_width = SCREEN_WIDTH * 0.45
 
-# --- Helper Function to Create the Feather Surface ---
-def create_feather_surface(width, height):
-    """Draws the feather onto a new, transparent surface."""
-    # Create a surface with a per-pixel alpha channel
-    feather_surf = pygame.Surface((width, height), pygame.SRCALPHA)
+    # Title
+    title_surface = TEXT_CACHE.render(trophy.title, title_font, TITLE_COLOR)
+    surface.blit(title_surface, (x, SCREEN_HEIGHT * 0.1))
+
+    # Description
+    draw_text(surface, trophy.description, (x, SCREEN_HEIGHT * 0.25), body_font, TEXT_COLOR, text_max_width)
+
+    # Game of Origin
+    game_surface = TEXT_CACHE.render(trophy.game, body_font, TITLE_COLOR)
+    surface.blit(game_surface, (x, SCREEN_HEIGHT * 0.82))
     
+    # Rotation Instructions
+    instruction_surface = TEXT_CACHE.render(ROTATION_INSTRUCTION, instruction_font, TITLE_COLOR)
+    surface.blit(instruction_surface, (x, SCREEN_HEIGHT * 0.90))
+
+# --- Helper Function to Bake the Text Panel ---
+def bake_text_panel(title_font, body_font, instruction_font, trophy):
+    """Renders the whole static text column into one surface.
+
+    Nothing else is drawn on the right half of the screen, so the panel is
+    opaque (filled with the background) and blits as a plain copy.
+    """
+    panel = pygame.Surface((SCREEN_WIDTH - int(SCREEN_WIDTH * 0.5), SCREEN_HEIGHT))
+    if pygame.display.get_surface() is not None:
+        panel = panel.convert()
+    panel.fill(BACKGROUND_COLOR)
+    draw_trophy_text(panel, 0, title_font, body_font, instruction_font, trophy)
+    return panel
+
+# --- Helper Function to Describe the Feather Art ---
+def feather_art(width, height):
+    """The feather as a catalog art description (see trophy_catalog.render_art)."""
     center_x = width // 2
     center_y = height // 2
     
@@ -75,10 +107,9 @@ def create_feather_surface(width, height):
         (center_x - 30, center_y + 50 + y_offset), # bottom-left
         (center_x - 40, center_y - 20 + y_offset)  # top-left
     ]
-    pygame.draw.polygon(feather_surf, WHITE, white_points)
 
     # Quill Line (Gray Line)
-    pygame.draw.line(feather_surf, GRAY, (center_x - 8, center_y - 75 + y_offset), (center_x - 2, center_y + 78 + y_offset), 3)
+    quill = ((center_x - 8, center_y - 75 + y_offset), (center_x - 2, center_y + 78 + y_offset))
 
     # Red Sash (Red Polygon)
     red_points = [
@@ -87,7 +118,6 @@ def create_feather_surface(width, height):
         (center_x + 25, center_y + 70 + y_offset),
         (center_x - 25, center_y + 70 + y_offset)
     ]
-    pygame.draw.polygon(feather_surf, RED, red_points)
 
     # Quill Tip (Yellow Polygon)
     yellow_points = [
@@ -95,9 +125,72 @@ def create_feather_surface(width, height):
         (center_x + 10, center_y + 78 + y_offset),
         (center_x, center_y + 95 + y_offset)
     ]
-    pygame.draw.polygon(feather_surf, YELLOW, yellow_points)
     
-    return feather_surf
+    return {"size": (width, height), "shapes": [
+        ("polygon", WHITE, white_points),
+        ("line", GRAY, quill[0], quill[1], 3),
+        ("polygon", RED, red_points),
+        ("polygon", YELLOW, yellow_points),
+    ]}
+
+# --- Helper Function to Create the Feather Surface ---
+def create_feather_surface(width, height, scale=1):
+    """Draws the feather onto a new, transparent surface (scaled up by scale)."""
+    return render_art(feather_art(width, height), scale)
+
+# The trophy shown when no catalog file is given
+BUILTIN_TROPHIES = [
+    (TROPHY_TITLE, TROPHY_GAME, TROPHY_DESCRIPTION, feather_art(FEATHER_BASE_WIDTH, FEATHER_BASE_HEIGHT)),
+]
+
+
+# --- Helper Function to Render One Rotation Frame ---
+def render_rotation_frame(source, angle):
+    """Fakes a 3D turn by squashing source horizontally by cos(angle).
+
+    Returns None when the trophy is edge-on (zero width).
+    """
+    # Calculate horizontal scaling based on cosine of the angle
+    scale_x_factor = math.cos(angle)
+    scaled_width = int(source.get_width() * abs(scale_x_factor))
+    
+    if scaled_width <= 0: # Avoid scaling to 0 width
+        return None
+    
+    # Scale the original feather surface
+    scaled_surface = pygame.transform.smoothscale(
+        source, (scaled_width, source.get_height())
+    )
+    
+    # If scale is negative, flip the image horizontally
+    if scale_x_factor < 0:
+        scaled_surface = pygame.transform.flip(scaled_surface, True, False)
+    return scaled_surface
+
+
+# --- Helper Function for the Floating Effect ---
+def float_offset(float_angle, amplitude=FLOAT_AMPLITUDE):
+    """Vertical bob in pixels for a point on the float sine wave."""
+    return int(math.sin(float_angle) * amplitude)
+
+
+# --- Loaded Trophy ---
+class TrophyView:
+    """One catalog trophy ready to show: its art and turntable cache.
+
+    Built on the loader's prefetch thread. The text panel is baked on the
+    main thread the first time the trophy is shown (fonts are not shared
+    between threads).
+    """
+    def __init__(self, trophy):
+        self.trophy = trophy
+        art = render_art(trophy.art)
+        self.rotation_cache = RotationCache(
+            lambda angle: render_rotation_frame(art, angle),
+            ROTATION_STEPS, ROTATION_CACHE_BUDGET,
+        )
+        self.text_panel = None
+        self.shown = False
 
 
 # --- Main Function ---
@@ -106,26 +199,47 @@ def main():
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Melee Trophy Viewer: Cape Feather")
-    clock = pygame.time.Clock()
-
-    # Load fonts
-    try:
-        title_font = pygame.font.SysFont("Arial", 28, bold=True)
-        body_font = pygame.font.SysFont("Arial", 18)
-        instruction_font = pygame.font.SysFont("Arial", 16, bold=True)
-    except:
-        print("Arial font not found, using default font.")
-        title_font = pygame.font.Font(None, 34)
-        body_font = pygame.font.Font(None, 24)
-        instruction_font = pygame.font.Font(None, 22)
-
-    # --- Create the base feather surface ---
-    original_feather_surface = create_feather_surface(FEATHER_BASE_WIDTH, FEATHER_BASE_HEIGHT)
+    scheduler = FrameScheduler(60)
+
+    # Load fonts (resolved once, then straight from the cached file paths)
+    fonts = FontCache(FONT_CACHE_PATH)
+    title_font = fonts.load("Arial", 28, bold=True, fallback_size=34)
+    body_font = fonts.load("Arial", 18, fallback_size=24)
+    instruction_font = fonts.load("Arial", 16, bold=True, fallback_size=22)
+    fonts.save()
+    print(fonts.report())
+
+    # --- Open the trophy catalog ---
+    # Optional catalog file: programhdrcapev0.py trophies.db
+    if len(sys.argv) > 1:
+        catalog = TrophyCatalog(sys.argv[1])
+    else:
+        catalog = TrophyCatalog.from_trophies(BUILTIN_TROPHIES)
+    loader = TrophyLoader(catalog, TrophyView, LOADED_TROPHIES)
+    ids = catalog.ids()
+    position = 0
+    search_text = None # None when not searching
+    typing = False
+
+    def show(position):
+        """Make ids[position] the current trophy and prefetch its neighbors."""
+        view = loader.get(ids[position])
+        if not view.shown:
+            # --- Pre-render the static text ---
+            if BAKE_TEXT_PANEL:
+                view.text_panel = bake_text_panel(title_font, body_font, instruction_font, view.trophy)
+            # Rotation frames are cached by quantized angle
+            if PREBUILD_TURNTABLE:
+                view.rotation_cache.prebuild(background=PREBUILD_IN_BACKGROUND)
+            view.shown = True
+        loader.prefetch([ids[(position + 1) % len(ids)], ids[(position - 1) % len(ids)]])
+        return view
+
+    view = show(position) if ids else None
 
     # --- Animation Variables ---
     float_angle = 0  # Angle for the sine wave to create floating effect
     float_speed = 0.05  # How fast the trophy bobs
-    float_amplitude = 10  # How high and low the trophy bobs
     
     rotate_angle = 0 # Angle for 3D rotation
     rotate_speed = 0.05 # How fast it rotates when key is held
@@ -138,7 +252,36 @@ def main():
                 running = False
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    running = False
+                    if search_text is None:
+                        running = False
+                    else: # Leave the search, back to the whole catalog
+                        search_text = None
+                        typing = False
+                        ids = catalog.ids()
+                        position = ids.index(view.trophy.id) if view is not None else 0
+                        view = show(position) if ids else None
+                elif typing and event.key == pygame.K_BACKSPACE:
+                    search_text = search_text[:-1]
+                    ids = catalog.search(search_text)
+                    position = 0
+                    view = show(position) if ids else None
+                elif typing and event.key == pygame.K_RETURN:
+                    typing = False
+                elif ids and event.key in (pygame.K_DOWN, pygame.K_PAGEDOWN):
+                    position = (position + 1) % len(ids)
+                    view = show(position)
+                elif ids and event.key in (pygame.K_UP, pygame.K_PAGEUP):
+                    position = (position - 1) % len(ids)
+                    view = show(position)
+            if event.type == pygame.TEXTINPUT:
+                if typing:
+                    search_text += event.text
+                    ids = catalog.search(search_text)
+                    position = 0
+                    view = show(position) if ids else None
+                elif event.text == "/":
+                    search_text = ""
+                    typing = True
 
         # Handle rotation input (holding keys)
         keys = pygame.key.get_pressed()
@@ -152,23 +295,12 @@ def main():
 
         # Update float animation
         float_angle = (float_angle + float_speed) % (2 * math.pi)
-        y_offset = int(math.sin(float_angle) * float_amplitude)
+        y_offset = float_offset(float_angle)
 
         # --- 3D Rotation Simulation ---
-        # Calculate horizontal scaling based on cosine of the angle
-        scale_x_factor = math.cos(rotate_angle)
-        scaled_width = int(FEATHER_BASE_WIDTH * abs(scale_x_factor))
-        
-        if scaled_width > 0: # Avoid scaling to 0 width
-            # Scale the original feather surface
-            scaled_surface = pygame.transform.smoothscale(
-                original_feather_surface, (scaled_width, FEATHER_BASE_HEIGHT)
-            )
-            
-            # If scale is negative, flip the image horizontally
-            if scale_x_factor < 0:
-                scaled_surface = pygame.transform.flip(scaled_surface, True, False)
+        scaled_surface = view.rotation_cache.get(rotate_angle) if view is not None else None
         
+        if scaled_surface is not None:
             # Get rect and position
             base_cx = SCREEN_WIDTH * 0.25
             base_cy = SCREEN_HEIGHT / 2
@@ -178,27 +310,30 @@ def main():
 
         # Draw Text
         text_x_start = SCREEN_WIDTH * 0.5
-        text_max_width = SCREEN_WIDTH * 0.45
-
-        # Title
-        title_surface = title_font.render(TROPHY_TITLE, True, TITLE_COLOR)
-        screen.blit(title_surface, (text_x_start, SCREEN_HEIGHT * 0.1))
-
-        # Description
-        draw_text(screen, TROPHY_DESCRIPTION, (text_x_start, SCREEN_HEIGHT * 0.25), body_font, TEXT_COLOR, text_max_width)
+        if view is None:
+            pass
+        elif view.text_panel is not None:
+            screen.blit(view.text_panel, (text_x_start, 0))
+        else:
+            draw_trophy_text(screen, text_x_start, title_font, body_font, instruction_font, view.trophy)
 
-        # Game of Origin
-        game_surface = body_font.render(TROPHY_GAME, True, TITLE_COLOR)
-        screen.blit(game_surface, (text_x_start, SCREEN_HEIGHT * 0.82))
-        
-        # Rotation Instructions
-        instruction_surface = instruction_font.render(ROTATION_INSTRUCTION, True, TITLE_COLOR)
-        screen.blit(instruction_surface, (text_x_start, SCREEN_HEIGHT * 0.90))
+        # Catalog position and search (only once there is something to browse)
+        if search_text is not None or len(ids) > 1:
+            if ids:
+                status = "%d / %d   %s" % (position + 1, len(ids), BROWSE_INSTRUCTION)
+            else:
+                status = "No matches"
+            if search_text is not None:
+                status = "Search: %s%s   %s" % (search_text, "_" if typing else "", status)
+            status_surface = TEXT_CACHE.render(status, instruction_font, TEXT_COLOR)
+            screen.blit(status_surface, (10, SCREEN_HEIGHT - status_surface.get_height() - 6))
 
 
+        # Wait for the frame's deadline, then show it
+        scheduler.tick()
         pygame.display.flip()
-        clock.tick(60)
 
+    print(scheduler.report())
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+"""Deterministic input recording and uncapped headless replay.
+
+A recording holds the level it was played on, a seed, the collision mode
+(rects or tiles, see World), the per-frame input bitmask fed to World.step
+(run-length encoded) and the final state of the run. Record a session by
+setting SAMSOFT_RECORD=run.rec when starting the game, then replay it with
+no window and no frame cap:
+
+    python replay.py run.rec
+    python replay.py run.rec --level path/to/level.lvl
+
+The replay fails (exit 1) if the final player rect, is_super, killed enemies
+or used coin blocks differ from what was recorded.
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+MAGIC = b"SSRP"
+VERSION = 2
+
+# magic, version, seed, frame count, run count, level spec length,
+# final state length, collision mode
+HEADER = struct.Struct("<4sHQIIHIB")
+HEADER_V1 = struct.Struct("<4sHQIIHI") # No collision mode: always rects
+RUN = struct.Struct("<HB") # frames (1..65535), input bitmask
+
+# Level specs: "demo", "gen:<width>" (generate_level with the seed) or
+# "file:<crc32>:<path>"
+
+# Header byte -> World collision mode
+COLLISION_MODES = ("rects", "tiles")
+
+
+def level_crc(path):
+    with open(path, "rb") as f:
+        return zlib.crc32(f.read())
+
+
+def level_spec_for(path=None):
+    """Describe the level a session is played on."""
+    if path is None:
+        return "demo"
+    return "file:%08x:%s" % (level_crc(path), path)
+
+
+def open_level(spec, seed=0, path=None):
+    """Return the LevelFile (or None for the demo level) a spec refers to.
+
+    path overrides where a "file:" level is read from; its CRC still has to
+    match the recording.
+    """
+    from level_stream import LevelFile, generate_level
+
+    if spec == "demo":
+        return None
+    kind, _, rest = spec.partition(":")
+    if kind == "gen":
+        handle, generated = tempfile.mkstemp(suffix=".lvl")
+        os.close(handle)
+        generate_level(generated, int(rest), seed=seed)
+        level = LevelFile(generated)
+        os.remove(generated) # The mmap keeps it readable on POSIX
+        return level
+    if kind == "file":
+        crc, _, recorded_path = rest.partition(":")
+        path = path or recorded_path
+        if "%08x" % level_crc(path) != crc:
+            raise ValueError("%s is not the level this run was recorded on" % path)
+        return LevelFile(path)
+    raise ValueError("unknown level spec %r" % spec)
+
+
+# --- Recorder ---
+class Recorder:
+    """Collects the per-frame inputs of a session as run-length pairs."""
+
+    def __init__(self, level_spec="demo", seed=0, collision="rects"):
+        self.level_spec = level_spec
+        self.seed = seed
+        self.collision = collision
+        self.runs = [] # [inputs, frames]
+        self.frames = 0
+
+    def record(self, inputs):
+        runs = self.runs
+        if runs and runs[-1][0] == inputs and runs[-1][1] < 0xFFFF:
+            runs[-1][1] += 1
+        else:
+            runs.append([inputs, 1])
+        self.frames += 1
+
+    def inputs(self):
+        """Yield the recorded inputs one frame at a time."""
+        for inputs, frames in self.runs:
+            for _ in range(frames):
+                yield inputs
+
+    def save(self, path, final_state):
+        spec = self.level_spec.encode("utf-8")
+        state = json.dumps(final_state, sort_keys=True).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.frames,
+                                len(self.runs), len(spec), len(state),
+                                COLLISION_MODES.index(self.collision)))
+            f.write(spec)
+            f.write(state)
+            f.write(b"".join(RUN.pack(frames, inputs) for inputs, frames in self.runs))
+
+    @classmethod
+    def load(cls, path):
+        """Return (recorder, final_state) read from a recording."""
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version = struct.unpack_from("<4sH", data, 0)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError("%s is not a version %d recording" % (path, VERSION))
+        if version == 1:
+            magic, version, seed, frames, run_count, spec_len, state_len = HEADER_V1.unpack_from(data, 0)
+            collision = 0
+            offset = HEADER_V1.size
+        else:
+            (magic, version, seed, frames, run_count, spec_len, state_len,
+             collision) = HEADER.unpack_from(data, 0)
+            offset = HEADER.size
+        spec = data[offset:offset + spec_len].decode("utf-8")
+        offset += spec_len
+        final_state = json.loads(data[offset:offset + state_len])
+        offset += state_len
+
+        recorder = cls(spec, seed, COLLISION_MODES[collision])
+        for i in range(run_count):
+            run_frames, inputs = RUN.unpack_from(data, offset + i * RUN.size)
+            recorder.runs.append([inputs, run_frames])
+        recorder.frames = frames
+        return recorder, final_state
+
+
+def replay(recorder, level_path=None):
+    """Re-run a recording headless and uncapped. Returns the final World."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import samsofthdr
+
+    world = samsofthdr.World(open_level(recorder.level_spec, recorder.seed, level_path),
+                             collision=recorder.collision)
+    return samsofthdr.simulate(recorder.inputs(), world)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded run headless and check its final state.")
+    parser.add_argument("recording")
+    parser.add_argument("--level", help="read a file level from here instead of the recorded path")
+    args = parser.parse_args()
+
+    recorder, expected = Recorder.load(args.recording)
+    start = time.perf_counter()
+    world = replay(recorder, args.level)
+    elapsed = time.perf_counter() - start
+
+    actual = world.state_summary()
+    print("%d frames in %.3fs (%.0f frames/sec, %.0fx real time)"
+          % (recorder.frames, elapsed, recorder.frames / elapsed if elapsed else 0,
+             recorder.frames / 60 / elapsed if elapsed else 0))
+    if actual != expected:
+        for key in sorted(expected):
+            if actual.get(key) != expected[key]:
+                print("MISMATCH %s: recorded %r, replayed %r" % (key, expected[key], actual.get(key)))
+        sys.exit(1)
+    print("final state matches")
+
+
+if __name__ == "__main__":
+    main()
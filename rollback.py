@@ -0,0 +1,405 @@
+"""Rollback netcode for World, played against a stand-in peer over loopback UDP.
+
+    python rollback.py                                   # play against the peer
+    python rollback.py --latency 120 --jitter 30 --loss 0.05
+    python rollback.py --headless 3600                   # no window: script both sides, then check
+    python rollback.py path/to/level.lvl --collision tiles
+
+The game has one player, so both peers drive it: the input stepped each
+frame is the two peers' bitmasks OR'ed together. Each side steps ahead on
+its own input (sent input_delay frames early) and a prediction of the
+peer's (the last input it heard). When the real input arrives and differs,
+the session restores the World.snapshot() from before that frame and
+re-simulates up to the present. Packets carry every input the peer hasn't
+acknowledged, so lost ones are resent, and a checksum of the latest
+confirmed frame so a desync shows up. A side more than max_prediction
+frames ahead of what it has heard from the peer waits for it.
+
+The stand-in peer is the same session on a second socket, playing a
+scripted run: in a thread next to the window, or stepped in turn on a
+simulated clock when headless. Latency, jitter and loss are added on the
+sending side of both sockets.
+"""
+import argparse
+import heapq
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+
+# ack, first frame, checksum frame, checksum, input count; then the inputs
+PACKET = struct.Struct("<IIIIB")
+
+# Frames our own input is scheduled ahead, hiding that much latency
+INPUT_DELAY = 2
+# Frames we may run ahead of the peer's last input before waiting for it
+MAX_PREDICTION = 12
+# Confirmed frames that are a multiple of this get checksummed
+CHECK_INTERVAL = 30
+
+
+def checksum(buffer):
+    import samsofthdr
+    return zlib.crc32(memoryview(buffer)[:samsofthdr.snapshot_length(buffer)])
+
+
+def scripted_inputs(seed=0):
+    """The stand-in peer's endless run: mostly right, jumping now and then."""
+    import samsofthdr as game
+
+    rnd = random.Random(seed)
+    while True:
+        inputs = game.INPUT_RIGHT if rnd.random() < 0.8 else game.INPUT_LEFT
+        if rnd.random() < 0.1:
+            inputs |= game.INPUT_JUMP
+        for _ in range(rnd.randrange(1, 20)):
+            yield inputs
+
+
+# --- Link ---
+class Link:
+    """A non-blocking UDP socket to one peer, with a made-up connection.
+
+    send() holds each datagram back latency +- jitter seconds and drops a
+    loss fraction of them; flush() sends the ones that are due.
+    """
+
+    def __init__(self, sock, address, latency=0.0, jitter=0.0, loss=0.0, seed=0,
+                 clock=time.perf_counter):
+        self.sock = sock
+        self.address = address
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.queue = [] # heap of (due, sequence, datagram)
+        self.sent = 0
+
+    def send(self, data):
+        if self.loss and self.random.random() < self.loss:
+            return
+        delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0.0)
+        heapq.heappush(self.queue, (self.clock() + delay, self.sent, data))
+        self.sent += 1
+        self.flush()
+
+    def flush(self):
+        queue = self.queue
+        now = self.clock()
+        while queue and queue[0][0] <= now:
+            self.sock.sendto(heapq.heappop(queue)[2], self.address)
+
+    def receive(self):
+        """Yield the datagrams waiting on the socket."""
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(2048)
+            except BlockingIOError:
+                return
+            yield data
+
+
+def loopback_pair(latency=0.0, jitter=0.0, loss=0.0, clock=time.perf_counter):
+    """Two Links on 127.0.0.1 talking to each other."""
+    socks = []
+    for _ in range(2):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.setblocking(False)
+        socks.append(sock)
+    a, b = socks
+    return (Link(a, b.getsockname(), latency, jitter, loss, seed=1, clock=clock),
+            Link(b, a.getsockname(), latency, jitter, loss, seed=2, clock=clock))
+
+
+# --- Session ---
+class RollbackSession:
+    """Keeps a fresh World in step with a peer's by predicting and rolling back.
+
+    Frame f is the step World.step() takes when world.frame == f. The last
+    max_prediction + 1 states are kept as snapshots in a ring of reused
+    buffers; that's all a rollback can need, since we never step more than
+    max_prediction frames past the peer's last input.
+    """
+
+    def __init__(self, world, link, input_delay=INPUT_DELAY, max_prediction=MAX_PREDICTION):
+        self.world = world
+        self.link = link
+        self.max_prediction = max_prediction
+        self.local = bytearray(input_delay) # our input per frame, nothing the first few
+        self.remote = bytearray()           # the peer's input per frame, as far as we have it
+        self.used_remote = bytearray()      # the peer input each stepped frame was run with
+        self.peer_ack = 0                   # how many of our inputs the peer has
+        self.history = [None] * (max_prediction + 1) # snapshot taken before frame f at f % len
+        self.scratch = None
+        self.checksums = {}      # frame -> checksum of our state after that many steps
+        self.peer_checksums = {} # the peer's, until ours for the frame is known
+        self.last_checksum = (0, 0)
+        self.desync_frame = None
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.stalls = 0
+
+    def advance(self, inputs):
+        """Run one frame with our input bitmask.
+
+        Reads the peer's packets (rolling back if they contradict what was
+        predicted), sends ours and steps. Returns False, without stepping,
+        while too far ahead of the peer.
+        """
+        self.poll()
+        world = self.world
+        if world.frame - len(self.remote) >= self.max_prediction:
+            self.stalls += 1
+            self.send()
+            return False
+        self.local.append(inputs)
+        self.send()
+        self._step()
+        return True
+
+    def _step(self):
+        world = self.world
+        frame = world.frame
+        slot = frame % len(self.history)
+        self.history[slot] = world.snapshot(self.history[slot])
+        remote = self.remote
+        if frame < len(remote):
+            peer = remote[frame]
+        else: # Predict: the peer keeps doing what it did last
+            peer = remote[-1] if remote else 0
+        if frame < len(self.used_remote):
+            self.used_remote[frame] = peer
+        else:
+            self.used_remote.append(peer)
+        world.step(self.local[frame] | peer)
+        if world.frame % CHECK_INTERVAL == 0 and world.frame <= len(remote):
+            self.scratch = world.snapshot(self.scratch)
+            self._confirmed(world.frame, checksum(self.scratch))
+
+    def poll(self):
+        """Take in the peer's packets and roll back to the first mispredicted frame."""
+        known = len(self.remote)
+        for data in self.link.receive():
+            ack, first, check_frame, peer_checksum, count = PACKET.unpack_from(data)
+            self.peer_ack = max(self.peer_ack, ack)
+            have = len(self.remote)
+            if first <= have < first + count:
+                start = PACKET.size + have - first
+                self.remote += data[start:PACKET.size + count]
+            if check_frame:
+                self._check(check_frame, peer_checksum)
+
+        world = self.world
+        stepped = min(len(self.remote), world.frame)
+        for frame in range(known, stepped):
+            if self.used_remote[frame] != self.remote[frame]:
+                self.rollback(frame)
+                break
+
+        # States that just became final (older ones were checksummed already)
+        first = known // CHECK_INTERVAL * CHECK_INTERVAL + CHECK_INTERVAL
+        for frame in range(first, stepped + 1, CHECK_INTERVAL):
+            if frame == world.frame:
+                self.scratch = world.snapshot(self.scratch)
+                self._confirmed(frame, checksum(self.scratch))
+            else:
+                self._confirmed(frame, checksum(self.history[frame % len(self.history)]))
+
+    def rollback(self, frame):
+        """Restore the state from before frame and step back up to the present."""
+        world = self.world
+        end = world.frame
+        world.restore(self.history[frame % len(self.history)])
+        while world.frame < end:
+            self._step()
+        self.rollbacks += 1
+        self.resimulated += end - frame
+
+    def send(self):
+        first = self.peer_ack
+        inputs = self.local[first:first + 255]
+        check_frame, check = self.last_checksum
+        self.link.send(PACKET.pack(len(self.remote), first, check_frame, check, len(inputs)) + inputs)
+
+    # --- Desync detection ---
+    def _confirmed(self, frame, check):
+        self.checksums[frame] = check
+        self.last_checksum = (frame, check)
+        peer = self.peer_checksums.pop(frame, None)
+        if peer is not None:
+            self._compare(frame, check, peer)
+
+    def _check(self, frame, peer):
+        own = self.checksums.get(frame)
+        if own is None:
+            self.peer_checksums[frame] = peer
+        else:
+            self._compare(frame, own, peer)
+
+    def _compare(self, frame, own, peer):
+        if own != peer and (self.desync_frame is None or frame < self.desync_frame):
+            self.desync_frame = frame
+
+    def confirmed_inputs(self):
+        """The combined input of every frame both sides' inputs are known for."""
+        count = min(len(self.local), len(self.remote))
+        return bytes(a | b for a, b in zip(self.local[:count], self.remote[:count]))
+
+    def report(self):
+        from samsofthdr import snapshot_length
+
+        snapshot = self.history[(self.world.frame - 1) % len(self.history)]
+        size = 0 if snapshot is None else snapshot_length(snapshot)
+        return ("frame %d, %d rollbacks (%d frames re-simulated), %d stalls, %d checksums, "
+                "history %d x %d bytes, %s"
+                % (self.world.frame, self.rollbacks, self.resimulated, self.stalls,
+                   len(self.checksums), len(self.history), size,
+                   "in sync" if self.desync_frame is None else "DESYNC at frame %d" % self.desync_frame))
+
+
+def verify(session, world):
+    """Step world (fresh, same level) through the session's confirmed
+    inputs and check it against every checksum the session took.
+
+    Returns the number of frames checked.
+    """
+    checked = 0
+    buffer = None
+    for inputs in session.confirmed_inputs():
+        world.step(inputs)
+        expected = session.checksums.get(world.frame)
+        if expected is not None:
+            buffer = world.snapshot(buffer)
+            if checksum(buffer) != expected:
+                raise AssertionError("frame %d differs from an offline re-simulation" % world.frame)
+            checked += 1
+    return checked
+
+
+# --- Stand-in peer ---
+class StandInPeer(threading.Thread):
+    """Plays a session on its own clock, in the background, from a script."""
+
+    def __init__(self, session, script, fps):
+        super().__init__(daemon=True)
+        self.session = session
+        self.script = script
+        self.fps = fps
+        self.stopped = threading.Event()
+
+    def run(self):
+        step_seconds = 1.0 / self.fps
+        next_time = time.perf_counter()
+        while not self.stopped.is_set():
+            self.session.advance(next(self.script))
+            next_time += step_seconds
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_headless(make_world, frames, args):
+    """Both sides scripted, one after the other each tick of a simulated clock."""
+    clock = SimulatedClock()
+    link, peer_link = loopback_pair(args.latency / 1000, args.jitter / 1000, args.loss, clock)
+    session = RollbackSession(make_world(), link, args.input_delay, args.max_prediction)
+    peer = RollbackSession(make_world(), peer_link, args.input_delay, args.max_prediction)
+    ours, theirs = scripted_inputs(seed=1), scripted_inputs(seed=2)
+    start = time.perf_counter()
+    for _ in range(frames):
+        clock.now += 1.0 / args.fps
+        session.advance(next(ours))
+        peer.advance(next(theirs))
+    elapsed = time.perf_counter() - start
+
+    print("%d ticks in %.2fs (%.0f ticks/sec for both sides)" % (frames, elapsed, frames / elapsed))
+    for name, side in (("local", session), ("peer", peer)):
+        print("%-5s %s; %d confirmed frames match an offline re-simulation"
+              % (name, side.report(), verify(side, make_world())))
+    if session.desync_frame is not None or peer.desync_frame is not None:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play with rollback netcode against a loopback stand-in peer.")
+    parser.add_argument("level", nargs="?", help="level file (default: the demo level)")
+    parser.add_argument("--collision", default="rects", choices=("rects", "tiles"))
+    parser.add_argument("--latency", type=float, default=100, help="one-way latency in ms")
+    parser.add_argument("--jitter", type=float, default=10, help="+- ms on top of the latency")
+    parser.add_argument("--loss", type=float, default=0.02, help="fraction of packets dropped")
+    parser.add_argument("--input-delay", type=int, default=INPUT_DELAY)
+    parser.add_argument("--max-prediction", type=int, default=MAX_PREDICTION)
+    parser.add_argument("--headless", type=int, metavar="FRAMES",
+                        help="no window: run both sides scripted for FRAMES ticks and check them")
+    args = parser.parse_args()
+    if args.headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    import pygame
+
+    import samsofthdr as game
+    from frame_scheduler import FrameScheduler
+    from level_stream import LevelFile
+    from static_layer import StaticLayer
+
+    def make_world():
+        level = LevelFile(args.level) if args.level else None
+        return game.World(level, collision=args.collision)
+
+    pygame.init()
+    args.fps = game.FPS
+    if args.headless:
+        run_headless(make_world, args.headless, args)
+        return
+
+    screen = pygame.display.set_mode((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+    scheduler = FrameScheduler(game.FPS)
+    link, peer_link = loopback_pair(args.latency / 1000, args.jitter / 1000, args.loss)
+    world = make_world()
+    session = RollbackSession(world, link, args.input_delay, args.max_prediction)
+    peer = StandInPeer(RollbackSession(make_world(), peer_link, args.input_delay, args.max_prediction),
+                       scripted_inputs(seed=2), game.FPS)
+    static_layer = StaticLayer(world.platform_list, world.level_width, game.SCREEN_HEIGHT, game.SKY_BLUE)
+    peer.start()
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+        session.advance(game.read_inputs(pygame.key.get_pressed()))
+        game.draw_world(screen, world, static_layer)
+        scheduler.tick()
+        pygame.display.flip()
+        if world.frame % game.FPS == 0:
+            pygame.display.set_caption("Rollback: %d rollbacks, %d stalls%s"
+                                       % (session.rollbacks, session.stalls,
+                                          "" if session.desync_frame is None else ", DESYNC"))
+
+    peer.stop()
+    print("local %s" % session.report())
+    print("peer  %s" % peer.session.report())
+    print(scheduler.report())
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import math
+import threading
+from collections import OrderedDict
+
+# Sentinel cached for angles whose frame is empty (edge-on, zero width)
+_EMPTY = object()
+
+
+# --- Rotation Frame Cache ---
+class RotationCache:
+    """Caches turntable frames keyed by a quantized rotation angle.
+
+    render_frame(angle) builds the frame for an angle (or returns None when
+    there is nothing to draw). A full turn is split into `steps` angles, so
+    any angle maps to one of a fixed set of frames; repeated angles cost a
+    dict lookup instead of a scale + flip. Frames are evicted least recently
+    used first once their pixels exceed memory_budget bytes.
+
+    prebuild() renders the whole turntable up front, optionally on a
+    background thread; get() renders on demand for anything not built yet.
+    """
+
+    def __init__(self, render_frame, steps=128, memory_budget=8 * 1024 * 1024):
+        self.render_frame = render_frame
+        self.steps = steps
+        self.memory_budget = memory_budget
+        self.frames = OrderedDict() # step -> Surface (or _EMPTY)
+        self.memory_used = 0
+        self.lock = threading.Lock()
+        self.prebuild_thread = None
+
+    def quantize(self, angle):
+        """Return the step index for an angle in radians."""
+        return round(angle / (2 * math.pi) * self.steps) % self.steps
+
+    def angle_for(self, step):
+        return 2 * math.pi * step / self.steps
+
+    @staticmethod
+    def _frame_size(frame):
+        if frame is _EMPTY:
+            return 0
+        return frame.get_width() * frame.get_height() * frame.get_bytesize()
+
+    def _store(self, step, frame):
+        with self.lock:
+            if step in self.frames:
+                return
+            self.frames[step] = frame
+            self.memory_used += self._frame_size(frame)
+            while self.memory_used > self.memory_budget and len(self.frames) > 1:
+                _, evicted = self.frames.popitem(last=False)
+                self.memory_used -= self._frame_size(evicted)
+
+    def get(self, angle):
+        """Return the cached frame for angle, rendering it on a miss."""
+        step = self.quantize(angle)
+        with self.lock:
+            frame = self.frames.get(step)
+            if frame is not None:
+                self.frames.move_to_end(step)
+        if frame is None:
+            frame = self.render_frame(self.angle_for(step))
+            if frame is None:
+                frame = _EMPTY
+            self._store(step, frame)
+        return None if frame is _EMPTY else frame
+
+    def prebuild(self, background=False):
+        """Render every step of the turntable (that fits in the budget).
+
+        With background=True this returns immediately and fills the cache
+        from a daemon thread; get() keeps working in the meantime.
+        """
+        if background:
+            self.prebuild_thread = threading.Thread(target=self.prebuild, daemon=True)
+            self.prebuild_thread.start()
+            return
+        for step in range(self.steps):
+            with self.lock:
+                done = step in self.frames
+            if not done:
+                frame = self.render_frame(self.angle_for(step))
+                self._store(step, _EMPTY if frame is None else frame)
@@ -0,0 +1,16 @@
+"""Importable name for samsofthdrv0x..x.py.
+
+The game's file name has dots in it, so it can't be imported directly. Use
+`import samsofthdr` (or `from samsofthdr import World`) from tools that want
+to drive the game headless; this swaps itself for the real game module.
+"""
+import importlib.util
+import os
+import sys
+
+_GAME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samsofthdrv0x..x.py")
+
+_spec = importlib.util.spec_from_file_location(__name__, _GAME_PATH)
+_module = importlib.util.module_from_spec(_spec)
+sys.modules[__name__] = _module
+_spec.loader.exec_module(_module)
@@ -1,11 +1,37 @@
+import os
 import pygame
+import struct
 import sys
+import time
+
+import numpy as np
+
+from engine import (ENEMY_SPEED, GRAVITY, JUMP_STRENGTH, PLAYER_SPEED, Enemy, PlatformGrid,
+                    Tile, TileGrid, fill_platforms)
+from enemy_pool import STATE_DTYPE, EnemyGroup
+from frame_profiler import FrameProfiler
+from frame_scheduler import FrameScheduler
+from framebuffer import Framebuffer, parse_spec
+from level_stream import LevelFile, TILE_COIN_BLOCK, TILE_PLATFORM, TILE_USED
+from particles import ParticleSystem
+from replay import Recorder, level_spec_for
+from static_layer import StaticLayer
+from surface_pool import SURFACE_POOL
 
 # --- Constants ---
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 400
 LEVEL_WIDTH = 1800 # Level is now 3x wider than screen
-FPS = 60
+FPS = 60 # Simulation rate: World.step always advances exactly 1/FPS seconds
+
+# Fixed-timestep loop: most steps run per rendered frame while catching up.
+# Past this the game slows down instead of spiralling.
+MAX_SUBSTEPS = 5
+
+# Low-res mode: SAMSOFT_FRAMEBUFFER=240x160 (or 240x160x4 to pick the scale)
+# draws into a GBA-sized framebuffer upscaled to a window that many times
+# bigger. The camera then shows only that much of the level.
+FRAMEBUFFER_SCALE = 3
 
 # Colors
 WHITE = (255, 255, 255)
@@ -18,11 +44,84 @@ BROWN = (139, 69, 19)     # Enemy
 YELLOW = (255, 220, 0)    # "Coin" Block
 GRAY = (150, 150, 150)    # "Used" Block
 
-# Physics
-GRAVITY = 0.5
-JUMP_STRENGTH = -12
-PLAYER_SPEED = 5
-ENEMY_SPEED = 2
+# Level streaming: how far past the screen edges level chunks stay loaded
+STREAM_MARGIN = SCREEN_WIDTH
+
+# How far past the screen edges enemies keep patrolling; farther ones sleep
+# and catch up when they wake, so this only trades CPU, not behavior
+ACTIVATION_MARGIN = 100
+
+# Main loop phases, in the order they run, for the frame profiler.
+# Set SAMSOFT_PROFILE=trace.json to turn it on (F3 toggles the graph); the
+# Chrome trace is written there on exit.
+PROFILE_PHASES = ("events", "level.stream", "player.update", "enemy_list.update",
+                  "camera", "collisions", "particles", "draw", "frame.wait", "display.flip")
+
+# Collision against level files: "rects" (platform blocks) or "tiles" (the
+# tile map itself, see TileGrid). SAMSOFT_COLLISION=tiles picks the latter.
+# Tiles only look at what the player's leading edge crosses, so a player
+# already inside a block (grown into one overhead) isn't shoved out
+# sideways the way rects do it, and the whole map is always there (rects
+# only has the streamed chunks). Runs can differ; recordings say which.
+COLLISION_MODES = ("rects", "tiles")
+
+# Tile code -> (color, type) for platforms loaded from level files
+TILE_PLATFORMS = {
+    TILE_PLATFORM: (GREEN, 'platform'),
+    TILE_COIN_BLOCK: (YELLOW, 'coin_block'),
+    TILE_USED: (GRAY, 'used'),
+}
+
+# Snapshots (World.snapshot): this header, then per living enemy its spawn
+# index and EnemyGroup record, then the killed spawn indices and the used
+# coin blocks' corners, sorted. A few hundred bytes to a few KB, so seconds
+# of per-frame history fit easily.
+# size, frame, deaths, camera x/y, previous camera x/y, previous player x
+# and bottom, player rect, vel_x, vel_y, flags, invincible_timer, enemy
+# ticks, activation region, loaded chunks, enemy / killed / used counts
+SNAPSHOT = struct.Struct("<III6i4iddBiq4iIII")
+ENEMY_RECORD_SIZE = 4 + STATE_DTYPE.itemsize
+# Buffers are allocated this much bigger than needed, so a history ring
+# rarely has to replace one as enemies load and blocks get used
+SNAPSHOT_SLACK = 1024
+# Snapshot flag bits
+ON_GROUND = 1
+IS_SUPER = 2
+IS_INVINCIBLE = 4
+HAS_REGION = 8
+
+# Input bits (what Player.update and World.step take instead of the key array)
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+
+def display_refresh_rate():
+    """Render rate for the main loop, in Hz.
+
+    SAMSOFT_RENDER_FPS overrides it; otherwise the monitor's refresh rate
+    when pygame can tell (pygame-ce), else FPS.
+    """
+    override = os.environ.get("SAMSOFT_RENDER_FPS")
+    if override:
+        return int(override)
+    get_rate = getattr(pygame.display, "get_current_refresh_rate", None)
+    rate = get_rate() if get_rate is not None else 0
+    return rate or FPS
+
+def lerp(a, b, alpha):
+    """Whole-pixel position alpha of the way from a to b."""
+    return a + round((b - a) * alpha)
+
+def read_inputs(keys):
+    """Pack a pygame.key.get_pressed() array into an input bitmask."""
+    inputs = 0
+    if keys[pygame.K_LEFT]:
+        inputs |= INPUT_LEFT
+    if keys[pygame.K_RIGHT]:
+        inputs |= INPUT_RIGHT
+    if keys[pygame.K_SPACE]:
+        inputs |= INPUT_JUMP
+    return inputs
 
 # --- Player Class ---
 class Player(pygame.sprite.Sprite):
@@ -33,13 +132,9 @@ class Player(pygame.sprite.Sprite):
         self.is_invincible = False # To prevent rapid hits
         self.invincible_timer = 0
         
-        # Create small image
-        self.image_small = pygame.Surface((20, 30))
-        self.image_small.fill(RED)
-        
-        # Create super image
-        self.image_super = pygame.Surface((20, 40))
-        self.image_super.fill(ORANGE)
+        # Small and super images (shared, never draw on them)
+        self.image_small = SURFACE_POOL.solid((20, 30), RED)
+        self.image_super = SURFACE_POOL.solid((20, 40), ORANGE)
         
         # Set initial image and rect
         self.image = self.image_small
@@ -50,17 +145,20 @@ class Player(pygame.sprite.Sprite):
         self.vel_x = 0
         self.vel_y = 0
         self.on_ground = False
+        self.level_width = LEVEL_WIDTH
+        self.hit_blocks = [] # Corners of coin blocks hit this step (World collects them)
+        self.particles = None # ParticleSystem for bonk and coin block effects, if any
 
-    def update(self, keys, platforms, camera_x):
+    def update(self, inputs, platforms, camera_x):
         # Reset horizontal velocity
         self.vel_x = 0
         
         # --- Handle Input ---
-        if keys[pygame.K_LEFT]:
+        if inputs & INPUT_LEFT:
             self.vel_x = -PLAYER_SPEED
-        if keys[pygame.K_RIGHT]:
+        if inputs & INPUT_RIGHT:
             self.vel_x = PLAYER_SPEED
-        if keys[pygame.K_SPACE] and self.on_ground:
+        if inputs & INPUT_JUMP and self.on_ground:
             # Player jumps
             self.vel_y = JUMP_STRENGTH
             self.on_ground = False
@@ -73,21 +171,27 @@ class Player(pygame.sprite.Sprite):
                 self.vel_y = 10
                 
         # --- Move and Check Collisions ---
-        
-        # Horizontal movement and collision
-        self.rect.x += self.vel_x
-        self.check_collisions_x(platforms)
-        
-        # Vertical movement and collision
-        self.rect.y += self.vel_y
-        self.on_ground = False # Assume not on ground until collision check
-        self.check_collisions_y(platforms)
+        if isinstance(platforms, TileGrid):
+            self.move_on_tiles(platforms)
+        else:
+            # Broadphase: only platforms around where we can end up this frame
+            swept = self.rect.union(self.rect.move(self.vel_x, self.vel_y)).inflate(4, 4)
+            nearby = platforms.query(swept)
+            
+            # Horizontal movement and collision
+            self.rect.x += self.vel_x
+            self.check_collisions_x(nearby)
+            
+            # Vertical movement and collision
+            self.rect.y += self.vel_y
+            self.on_ground = False # Assume not on ground until collision check
+            self.check_collisions_y(nearby)
 
         # Keep player within level bounds
         if self.rect.left < 0:
             self.rect.left = 0
-        if self.rect.right > LEVEL_WIDTH:
-            self.rect.right = LEVEL_WIDTH
+        if self.rect.right > self.level_width:
+            self.rect.right = self.level_width
             
         # Update invincibility timer
         if self.is_invincible:
@@ -96,9 +200,9 @@ class Player(pygame.sprite.Sprite):
                 self.is_invincible = False
                 # Simple flash effect off
                 if self.is_super:
-                    self.image.fill(ORANGE)
+                    self.image = self.image_super
                 else:
-                    self.image.fill(RED)
+                    self.image = self.image_small
 
     def check_collisions_x(self, platforms):
         """Check for horizontal collisions."""
@@ -120,18 +224,70 @@ class Player(pygame.sprite.Sprite):
             elif self.vel_y < 0: # Moving up (jumping)
                 self.rect.top = platform.rect.bottom
                 self.vel_y = 0 # Bonk!
+                if self.particles is not None:
+                    self.particles.bonk(self.rect)
                 
                 # Check if we bonked a special block
                 if platform.type == 'coin_block':
                     self.hit_coin_block(platform)
 
+    def move_on_tiles(self, grid):
+        """Move and collide against a TileGrid.
+
+        Only the cells the leading edge crosses this frame are looked at:
+        a column or two across the player's rows when moving sideways, a
+        row or two across its columns when moving up or down.
+        """
+        size = grid.tile_size
+        rect = self.rect
+
+        # Horizontal movement and collision
+        left, right = rect.left, rect.right
+        rect.x += self.vel_x
+        rows = (rect.top // size, (rect.bottom - 1) // size)
+        if rect.right > right: # Moving right
+            col = grid.first_solid_column(range(right // size, (rect.right - 1) // size + 1), *rows)
+            if col is not None:
+                rect.right = col * size
+        elif rect.left < left: # Moving left
+            col = grid.first_solid_column(range((left - 1) // size, rect.left // size - 1, -1), *rows)
+            if col is not None:
+                rect.left = (col + 1) * size
+
+        # Vertical movement and collision
+        top, bottom = rect.top, rect.bottom
+        rect.y += self.vel_y
+        self.on_ground = False # Assume not on ground until collision check
+        cols = (rect.left // size, (rect.right - 1) // size)
+        if rect.bottom > bottom: # Falling
+            row = grid.first_solid_row(range(bottom // size, (rect.bottom - 1) // size + 1), *cols)
+            if row is not None:
+                rect.bottom = row * size
+                self.vel_y = 0
+                self.on_ground = True
+        elif rect.top < top: # Jumping
+            row = grid.first_solid_row(range((top - 1) // size, rect.top // size - 1, -1), *cols)
+            if row is not None:
+                rect.top = (row + 1) * size
+                self.vel_y = 0 # Bonk!
+                if self.particles is not None:
+                    self.particles.bonk(rect)
+                
+                # Check if we bonked special blocks
+                for col in range(cols[0], cols[1] + 1):
+                    if grid.type_at(col, row) == 'coin_block':
+                        self.hit_coin_block(Tile(grid, col, row))
+
     def hit_coin_block(self, block):
         """Called when player hits a coin block from below."""
         if not self.is_super:
             self.grow()
-        block.color = GRAY # Change color to "used"
-        block.image.fill(block.color)
+        block.color = GRAY # Change color to "used" (picks a new shared image)
         block.type = 'used' # Can't be used again
+        block.dirty = 1 # Static layer needs to re-bake it
+        self.hit_blocks.append(block.rect.topleft)
+        if self.particles is not None:
+            self.particles.coin_block(block.rect)
 
     def grow(self):
         """Make the player 'super'."""
@@ -152,7 +308,6 @@ class Player(pygame.sprite.Sprite):
         bottom = self.rect.bottom
         self.image = self.image_small
         self.rect = self.image.get_rect(bottom=bottom, centerx=self.rect.centerx)
-        self.image.fill(RED) # Ensure it's the right color
 
     def take_damage(self):
         """Handle player taking damage from an enemy."""
@@ -173,165 +328,615 @@ class Player(pygame.sprite.Sprite):
         if self.is_super:
             self.shrink()
             self.is_invincible = False
-            self.image.fill(RED)
 
 
-# --- Enemy Class ---
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y, move_range):
-        super().__init__()
-        self.image = pygame.Surface((20, 20))
-        self.image.fill(BROWN)
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
+# --- World Class ---
+class World:
+    """All the game state for one level, steppable with or without a window.
+
+    step() advances the game by exactly one frame and never touches the
+    display, the event queue or the clock, so it can be driven as fast as the
+    CPU allows for level validation and regression runs.
+
+    view_size decides what the camera shows, and so which chunks are
+    streamed in and which enemies are awake, but never how a run plays
+    out: a run recorded in a small framebuffer replays the same at the
+    default size.
+    """
+    def __init__(self, level=None, activation_margin=ACTIVATION_MARGIN,
+                 view_size=(SCREEN_WIDTH, SCREEN_HEIGHT), collision="rects", particles=None):
+        # Camera offset and how much of the level it shows
+        self.camera_x = 0
+        self.camera_y = 0
+        self.prev_camera_x = 0
+        self.prev_camera_y = 0
+        self.view_width, self.view_height = view_size
+        self.frame = 0
+        self.deaths = 0
+        self.profiler = FrameProfiler(PROFILE_PHASES) # Disabled unless turned on
+
+        # Sprite groups; platforms are packed blocks, not sprites
+        self.all_sprites = pygame.sprite.Group()
+        self.enemy_list = EnemyGroup()
+        self.activation_margin = activation_margin
+        if collision not in COLLISION_MODES:
+            raise ValueError("collision must be one of %s, got %r" % (COLLISION_MODES, collision))
+        if collision == "tiles":
+            if level is None:
+                raise ValueError("tile collision needs a level file; the demo level isn't tile based")
+            # The whole tile map, kept for the run; only enemies stream
+            self.platform_list = TileGrid.from_level(level, TILE_PLATFORMS)
+        else:
+            self.platform_list = PlatformGrid()
+        self.collision = collision
+
+        # A LevelFile streams its chunks in around the camera; without one
+        # we build the built-in demo level
+        self.level = level
+        self.level_used = set() # top-left corners of the blocks the level starts out with used
+        if level is None:
+            self.level_width = LEVEL_WIDTH
+            self.player_start_pos = (50, 300)
+        else:
+            self.level_width = level.width_px
+            self.player_start_pos = level.start
+            size = level.tile_size
+            self.level_used = {(col * size, row * size) for col, row in level.positions(TILE_USED)}
+            self.loaded_chunks = {}   # chunk -> (platform indices, enemies)
+            self.loaded_range = None
+            self.tile_overrides = {}  # (column, row) -> tile code, e.g. used coin blocks
+        self.killed_spawns = set() # spawn indices of the enemies that were stomped
+        self.used_corners = set()  # top-left corners of the coin blocks used this run
+
+        # Create player
+        self.player = Player(self.player_start_pos[0], self.player_start_pos[1])
+        self.player.level_width = self.level_width
+        self.all_sprites.add(self.player)
+        # Optional ParticleSystem for stomps, bonks and coin blocks; only
+        # windowed play passes one, headless runs don't need the show
+        self.particles = particles
+        self.player.particles = particles
+        # Where the player was before the last step (x, bottom), for interpolation
+        self.prev_player_pos = (self.player.rect.x, self.player.rect.bottom)
+
+        if level is None:
+            self.build_demo_level()
+        else:
+            self.stream_level()
+
+    def build_demo_level(self):
+        """Create the platforms and enemies for the built-in level."""
+        platform_list = self.platform_list
+        enemy_list = self.enemy_list
+
+        # --- Create platforms for a simple level ---
+        # Ground
+        platform_list.add(0, SCREEN_HEIGHT - 40, LEVEL_WIDTH, 40)
         
-        self.start_x = x
-        self.move_range = move_range
-        self.direction = ENEMY_SPEED
-
-    def update(self):
-        # Move back and forth
-        self.rect.x += self.direction
-        if self.rect.x > self.start_x + self.move_range or self.rect.x < self.start_x:
-            self.direction *= -1 # Turn around
-
-# --- Platform Class ---
-class Platform(pygame.sprite.Sprite):
-    def __init__(self, x, y, w, h, color=GREEN, type='platform'):
-        super().__init__()
-        self.image = pygame.Surface((w, h))
-        self.color = color
-        self.image.fill(self.color)
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
-        self.type = type
+        # Floating platforms
+        platform_list.add(200, 300, 100, 20)
+        platform_list.add(350, 240, 80, 20)
+        
+        # "Coin" block
+        platform_list.add(150, 250, 30, 30, YELLOW, 'coin_block')
+        
+        # More level content
+        platform_list.add(550, 200, 100, 20)
+        platform_list.add(700, 300, 150, 20)
+        platform_list.add(900, 250, 50, 20)
+        platform_list.add(1100, 200, 100, 20)
+        
+        # --- Create enemies ---
+        enemy1 = Enemy(200, 280, 80) # On plat1
+        enemy1.spawn_index = 0
+        enemy_list.add(enemy1)
+        
+        enemy2 = Enemy(700, 280, 130) # On plat4
+        enemy2.spawn_index = 1
+        enemy_list.add(enemy2)
+        
+        self.all_sprites.add(enemy_list)
+
+    def stream_level(self):
+        """Load the level chunks near the camera and evict the rest.
+
+        Only what changed is remembered for evicted chunks (used coin blocks
+        and stomped enemies), so memory stays flat however long the level is;
+        patrols follow from the frame count.
+        """
+        level = self.level
+        first = max((self.camera_x - STREAM_MARGIN) // level.chunk_px, 0)
+        last = min((self.camera_x + self.view_width + STREAM_MARGIN) // level.chunk_px,
+                   level.chunk_count - 1)
+        self.load_range(first, last)
+
+    def load_range(self, first, last):
+        """Make chunks first..last the loaded ones."""
+        if self.loaded_range == (first, last):
+            return
+        self.loaded_range = (first, last)
+
+        for chunk in list(self.loaded_chunks):
+            if chunk < first or chunk > last:
+                self.evict_chunk(chunk)
+        for chunk in range(first, last + 1):
+            if chunk not in self.loaded_chunks:
+                self.load_chunk(chunk)
+
+    def load_chunk(self, chunk):
+        """Add the platform blocks and Enemy sprites for one level chunk.
+
+        Enemies come in where their patrol has got to since frame 0, so a
+        chunk streamed back in looks the same as if it had never left.
+        """
+        level = self.level
+        platforms = []
+        if self.collision == "rects":
+            add_platform = self.platform_list.add
+            platforms = [add_platform(x, y, w, h, *TILE_PLATFORMS[tile])
+                         for x, y, w, h, tile in level.chunk_runs(chunk, self.tile_overrides)]
+            # Art baked before the chunk left may show blocks changed since
+            self.platform_list.dirty_rects.add(
+                (chunk * level.chunk_px, 0, level.chunk_px, level.height_px))
+        enemies = []
+        for index, x, y, move_range in level.chunk_enemies(chunk):
+            if index in self.killed_spawns:
+                continue
+            enemy = Enemy(x, y, move_range)
+            enemy.spawn_index = index
+            enemies.append(enemy)
+
+        self.enemy_list.add_patrolling(enemies)
+        self.all_sprites.add(enemies)
+        self.loaded_chunks[chunk] = (platforms, enemies)
+
+    def evict_chunk(self, chunk):
+        """Remove one chunk's blocks and sprites, remembering which blocks were used."""
+        platforms, enemies = self.loaded_chunks.pop(chunk)
+        platform_list = self.platform_list
+        size = self.level.tile_size
+        for index in platforms:
+            if platform_list.block(index).type == 'used':
+                tile = (platform_list.x[index] // size, platform_list.y[index] // size)
+                self.tile_overrides[tile] = TILE_USED
+            platform_list.remove(index)
+        for enemy in enemies:
+            enemy.kill() # Stomped ones are already in killed_spawns
+
+    def step(self, inputs):
+        """Advance one frame. inputs is a bitmask of INPUT_* flags."""
+        player = self.player
+        enemy_list = self.enemy_list
+        start_x, start_y = self.player_start_pos
+        mark = self.profiler.mark
+        self.frame += 1
+        deaths = self.deaths
+        self.prev_camera_x = self.camera_x
+        self.prev_camera_y = self.camera_y
+        self.prev_player_pos = (player.rect.x, player.rect.bottom)
+        if self.level is not None:
+            self.stream_level()
+        mark("level.stream")
+
+        # --- Update ---
+        player.update(inputs, self.platform_list, self.camera_x)
+        if player.hit_blocks:
+            self.used_corners.update(player.hit_blocks)
+            player.hit_blocks.clear()
+        mark("player.update")
+        self.wake_enemies()
+        enemy_list.update()
+        mark("enemy_list.update")
+        
+        self.follow_player()
+        mark("camera")
+
+        # --- Check for Game Over Conditions ---
+        # Player falls off screen
+        if player.rect.top > SCREEN_HEIGHT:
+            player.reset(start_x, start_y)
+            self.deaths += 1
+            self.snap_to_player()
+
+        # Check for collision with enemies, in spawn order (the slot order
+        # depends on when chunks were streamed in)
+        enemy_hit_list = sorted(enemy_list.collide(player), key=lambda enemy: enemy.spawn_index)
+        for hit_enemy in enemy_hit_list:
+            # Check if player landed on top of enemy (a simple stomp)
+            if player.vel_y > 0 and (player.rect.bottom < hit_enemy.rect.centery + 10):
+                hit_enemy.kill() # "Stomped" the enemy
+                if self.particles is not None:
+                    self.particles.stomp(hit_enemy.rect)
+                self.killed_spawns.add(hit_enemy.spawn_index)
+                player.vel_y = -JUMP_STRENGTH / 2 # Small bounce
+            else:
+                # Player was hit from the side or bottom
+                if player.take_damage(): # take_damage returns True if reset is needed
+                    player.reset(start_x, start_y)
+                    self.deaths += 1
+        if self.deaths != deaths:
+            self.snap_to_player()
+        mark("collisions")
+
+        if self.particles is not None:
+            self.particles.update()
+        mark("particles")
+
+    def follow_player(self):
+        """Move the camera to the player."""
+        # Tries to center player, but stops at level edges
+        player = self.player
+        view_width = self.view_width
+        target_camera_x = player.rect.x - view_width // 2
+        # Clamp camera to level bounds
+        if target_camera_x < 0:
+            self.camera_x = 0
+        elif target_camera_x > self.level_width - view_width:
+            self.camera_x = self.level_width - view_width
+        else:
+            self.camera_x = target_camera_x
+        # A view shorter than the level follows the player vertically too
+        if self.view_height < SCREEN_HEIGHT:
+            target_camera_y = player.rect.centery - self.view_height // 2
+            self.camera_y = min(max(target_camera_y, 0), SCREEN_HEIGHT - self.view_height)
+
+    def wake_enemies(self):
+        """Only enemies around the camera patrol and can be hit."""
+        margin = self.activation_margin
+        self.enemy_list.activate(self.camera_x - margin, self.camera_x + self.view_width + margin)
+
+    def snap_to_player(self):
+        """After a respawn: bring the camera, the streamed chunks and the
+        awake enemies to the player right away.
+
+        Otherwise the start of the level could still be unloaded (or its
+        enemies asleep) on the next step, by an amount that depends on how
+        wide the view is.
+        """
+        self.follow_player()
+        if self.level is not None:
+            self.stream_level()
+        self.wake_enemies()
+        # Don't interpolate across the level
+        self.prev_camera_x = self.camera_x
+        self.prev_camera_y = self.camera_y
+        self.prev_player_pos = (self.player.rect.x, self.player.rect.bottom)
+
+    def used_blocks(self):
+        """Top-left corners of every coin block that has been used, sorted.
+
+        Read from what World keeps as blocks get used, so it costs the same
+        however long the level is.
+        """
+        return sorted(self.level_used | self.used_corners)
+
+    # --- Snapshots ---
+    def snapshot_size(self):
+        """Bytes snapshot() needs for the current state."""
+        return (SNAPSHOT.size + len(self.enemy_list) * ENEMY_RECORD_SIZE
+                + 4 * len(self.killed_spawns) + 8 * len(self.used_corners))
+
+    def snapshot(self, buffer=None):
+        """Write the whole mutable state into buffer (a bytearray) and return it.
+
+        A buffer that is too small (or None) is replaced by a new one with
+        some slack, so keep whatever comes back and pass it in next time.
+        Only numbers are copied: the player, the camera, the enemy arrays
+        and the killed enemies and used blocks; the level, its static data
+        and the particles (only for show) aren't. restore() puts it back
+        into this World (or any built from the same level and collision
+        mode). Use snapshot_length() for how much of the buffer holds the
+        state.
+        """
+        size = self.snapshot_size()
+        if buffer is None or len(buffer) < size:
+            buffer = bytearray(size + SNAPSHOT_SLACK)
+        enemy_list = self.enemy_list
+        n = len(enemy_list)
+        killed = sorted(self.killed_spawns)
+        used = sorted(self.used_corners)
+        offset = SNAPSHOT.size
+        sprites = enemy_list.save_state(np.frombuffer(buffer, STATE_DTYPE, n, offset + 4 * n))
+        np.frombuffer(buffer, "<i4", n, offset)[:] = [sprite.spawn_index for sprite in sprites]
+        offset += n * ENEMY_RECORD_SIZE
+        np.frombuffer(buffer, "<i4", len(killed), offset)[:] = killed
+        offset += 4 * len(killed)
+        if used:
+            np.frombuffer(buffer, "<i4", 2 * len(used), offset).reshape(-1, 2)[:] = used
+
+        player = self.player
+        flags = ((ON_GROUND if player.on_ground else 0) | (IS_SUPER if player.is_super else 0)
+                 | (IS_INVINCIBLE if player.is_invincible else 0))
+        region = enemy_list.region
+        if region is not None:
+            flags |= HAS_REGION
+        else:
+            region = (0, 0)
+        loaded = self.loaded_range if self.level is not None else (0, 0)
+        SNAPSHOT.pack_into(buffer, 0, size, self.frame, self.deaths,
+                           self.camera_x, self.camera_y, self.prev_camera_x, self.prev_camera_y,
+                           *self.prev_player_pos, *player.rect, player.vel_x, player.vel_y,
+                           flags, player.invincible_timer, enemy_list.ticks, *region, *loaded,
+                           n, len(killed), len(used))
+        return buffer
+
+    def restore(self, buffer):
+        """Go back to the state snapshot() wrote into buffer.
+
+        Coin blocks and enemies that changed since are patched in place
+        (and their StaticLayer chunks re-baked); chunks are only streamed
+        when the snapshot had others loaded.
+        """
+        (size, self.frame, self.deaths, self.camera_x, self.camera_y,
+         self.prev_camera_x, self.prev_camera_y, prev_x, prev_bottom, x, y, w, h,
+         vel_x, vel_y, flags, invincible_timer, ticks, region_first, region_last,
+         loaded_first, loaded_last, n, killed, used) = SNAPSHOT.unpack_from(buffer)
+        offset = SNAPSHOT.size
+        spawns = np.frombuffer(buffer, "<i4", n, offset).tolist()
+        records = np.frombuffer(buffer, STATE_DTYPE, n, offset + 4 * n)
+        offset += n * ENEMY_RECORD_SIZE
+        self.killed_spawns = set(np.frombuffer(buffer, "<i4", killed, offset).tolist())
+        offset += 4 * killed
+        corners = np.frombuffer(buffer, "<i4", 2 * used, offset).reshape(-1, 2).tolist()
+        if self.level is not None:
+            self.load_range(loaded_first, loaded_last)
+        self.set_used_corners({(cx, cy) for cx, cy in corners})
+
+        # Enemies: reuse the loaded sprites, recreate the ones stomped since
+        enemy_list = self.enemy_list
+        loaded = {sprite.spawn_index: sprite for sprite in enemy_list}
+        sprites = []
+        created = []
+        for i, spawn in enumerate(spawns):
+            sprite = loaded.get(spawn)
+            if sprite is None:
+                record = records[i]
+                sprite = Enemy(int(record["start_x"]), int(record["y"]), int(record["move_range"]))
+                sprite.spawn_index = spawn
+                created.append(sprite)
+            sprites.append(sprite)
+        region = (region_first, region_last) if flags & HAS_REGION else None
+        enemy_list.load_state(sprites, records, ticks, region)
+        self.all_sprites.add(created)
+        if self.level is not None and (created or len(loaded) != n):
+            # Chunks evict their own enemies: hand each its current sprites
+            by_spawn = dict(zip(spawns, sprites))
+            for chunk, (platforms, _) in self.loaded_chunks.items():
+                self.loaded_chunks[chunk] = (platforms, [
+                    by_spawn[spawn] for spawn, *_ in self.level.chunk_enemies(chunk)
+                    if spawn in by_spawn])
+
+        player = self.player
+        player.is_super = bool(flags & IS_SUPER)
+        player.image = player.image_super if player.is_super else player.image_small
+        player.rect.update(x, y, w, h)
+        player.vel_x = vel_x
+        player.vel_y = vel_y
+        player.on_ground = bool(flags & ON_GROUND)
+        player.is_invincible = bool(flags & IS_INVINCIBLE)
+        player.invincible_timer = invincible_timer
+        player.hit_blocks.clear()
+        self.prev_player_pos = (prev_x, prev_bottom)
+
+    def set_used_corners(self, corners):
+        """Make exactly the coin blocks at corners (this run's) used."""
+        used = self.used_corners
+        for corner in used - corners:
+            self._mark_block(corner, False)
+        for corner in corners - used:
+            self._mark_block(corner, True)
+        self.used_corners = set(corners)
+
+    def _mark_block(self, corner, used):
+        x, y = corner
+        if self.collision == "tiles":
+            grid = self.platform_list
+            blocks = [Tile(grid, x // grid.tile_size, y // grid.tile_size)]
+        else:
+            blocks = [block for block in self.platform_list.query((x, y, 1, 1))
+                      if block.rect.topleft == corner and block.type in ('coin_block', 'used')]
+            if self.level is not None: # Evicted chunks keep it here
+                size = self.level.tile_size
+                if used:
+                    self.tile_overrides[(x // size, y // size)] = TILE_USED
+                else:
+                    self.tile_overrides.pop((x // size, y // size), None)
+                # An evicted block has no view to flag dirty
+                self.platform_list.dirty_rects.add((x, y, size, size))
+        color, type = (GRAY, 'used') if used else (YELLOW, 'coin_block')
+        for block in blocks:
+            block.color = color
+            block.type = type
+            block.dirty = 1
+
+    def state_summary(self):
+        """The end-of-run state a replay has to reproduce exactly."""
+        player = self.player
+        return {
+            "player_rect": list(player.rect),
+            "is_super": player.is_super,
+            "killed_enemies": sorted(self.killed_spawns),
+            "used_blocks": [list(corner) for corner in self.used_blocks()],
+        }
+
+
+def snapshot_length(buffer):
+    """How many bytes of a World.snapshot() buffer hold the state."""
+    return SNAPSHOT.unpack_from(buffer)[0]
+
+
+def simulate(input_frames, world=None):
+    """Step a world headless through a sequence of input bitmasks.
+
+    No display, no event pump and no frame cap: this runs as fast as the CPU
+    allows. Returns the world so callers can inspect the final state.
+    """
+    if world is None:
+        world = World()
+    step = world.step
+    for inputs in input_frames:
+        step(inputs)
+    return world
+
+# --- Rendering ---
+def draw_world(screen, world, static_layer=None, hide_player=False, alpha=1.0):
+    """Draw the sprites the camera can see, offset by the camera, in one batch.
+
+    With a StaticLayer the sky and platforms come from its baked chunks;
+    without one the sky is filled and visible platforms are filled from the
+    platform grid. Enemies come from the enemy arrays, so only sprites inside
+    the view are touched; draw order is player, then platforms, then
+    enemies, then particles.
+
+    alpha < 1 draws the moving parts (camera, player, enemies) that far
+    between the previous step and the current one.
+
+    screen is world.view_width x world.view_height: the window, or a
+    low-res Framebuffer's surface.
+    """
+    player = world.player
+    if alpha < 1:
+        camera_x = lerp(world.prev_camera_x, world.camera_x, alpha)
+        camera_y = lerp(world.prev_camera_y, world.camera_y, alpha)
+        prev_x, prev_bottom = world.prev_player_pos
+        player_pos = (lerp(prev_x, player.rect.x, alpha),
+                      lerp(prev_bottom, player.rect.bottom, alpha) - player.rect.height)
+    else:
+        camera_x = world.camera_x
+        camera_y = world.camera_y
+        player_pos = player.rect.topleft
+    view = pygame.Rect(camera_x, camera_y, world.view_width, world.view_height)
+    
+    if static_layer is not None:
+        static_layer.draw(screen, camera_x, camera_y)
+    else:
+        screen.fill(SKY_BLUE)
+    
+    if not hide_player:
+        screen.blit(player.image, (player_pos[0] - camera_x, player_pos[1] - camera_y))
+    if static_layer is None:
+        fill_platforms(screen, world.platform_list, camera_x, camera_y)
+    if alpha < 1:
+        # Enemies only walk sideways; widen the query by their step
+        enemies, xs = world.enemy_list.interpolated(view.inflate(2 * ENEMY_SPEED, 0), alpha)
+        screen.blits([(sprite.image, (x - camera_x, sprite.rect.y - camera_y))
+                      for sprite, x in zip(enemies, xs)], False)
+    else:
+        screen.blits([(sprite.image, (sprite.rect.x - camera_x, sprite.rect.y - camera_y))
+                      for sprite in world.enemy_list.sync(view)], False)
+    if world.particles is not None:
+        world.particles.draw(screen, camera_x, camera_y)
 
 # --- Main Game Function ---
 def main():
     pygame.init()
     
-    # Set up the display
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    # Set up the display (and the low-res framebuffer, if asked for)
+    framebuffer_spec = os.environ.get("SAMSOFT_FRAMEBUFFER")
+    if framebuffer_spec:
+        view_size, scale = parse_spec(framebuffer_spec, FRAMEBUFFER_SCALE)
+        window = pygame.display.set_mode((view_size[0] * scale, view_size[1] * scale))
+        framebuffer = Framebuffer(view_size, window)
+        screen = framebuffer.surface
+    else:
+        view_size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        window = screen = pygame.display.set_mode(view_size)
+        framebuffer = None
     pygame.display.set_caption("GBA-style Platformer Simulation")
-    clock = pygame.time.Clock()
     
-    # Camera offset
-    camera_x = 0
-
     # --- Create Game Objects ---
+    # Optional level file: samsofthdrv0x..x.py path/to/level.bin
+    level_path = sys.argv[1] if len(sys.argv) > 1 else None
+    level = LevelFile(level_path) if level_path else None
+    world = World(level, view_size=view_size,
+                  collision=os.environ.get("SAMSOFT_COLLISION", "rects"),
+                  particles=ParticleSystem())
+    player = world.player
+    static_layer = StaticLayer(world.platform_list, world.level_width, SCREEN_HEIGHT, SKY_BLUE)
     
-    # Sprite groups
-    all_sprites = pygame.sprite.Group()
-    platform_list = pygame.sprite.Group()
-    enemy_list = pygame.sprite.Group()
-
-    # Create player
-    player_start_pos = (50, 300)
-    player = Player(player_start_pos[0], player_start_pos[1])
-    all_sprites.add(player)
-    
-    # --- Create platforms for a simple level ---
-    # Ground
-    ground = Platform(0, SCREEN_HEIGHT - 40, LEVEL_WIDTH, 40)
-    platform_list.add(ground)
-    
-    # Floating platforms
-    plat1 = Platform(200, 300, 100, 20)
-    platform_list.add(plat1)
-    
-    plat2 = Platform(350, 240, 80, 20)
-    platform_list.add(plat2)
-    
-    # "Coin" block
-    coin_block = Platform(150, 250, 30, 30, YELLOW, 'coin_block')
-    platform_list.add(coin_block)
-    
-    # More level content
-    plat3 = Platform(550, 200, 100, 20)
-    platform_list.add(plat3)
-    
-    plat4 = Platform(700, 300, 150, 20)
-    platform_list.add(plat4)
+    # Opt-in frame profiler
+    profile_path = os.environ.get("SAMSOFT_PROFILE")
+    profiler = world.profiler
+    profiler.set_enabled(bool(profile_path))
     
-    plat5 = Platform(900, 250, 50, 20)
-    platform_list.add(plat5)
-    
-    plat6 = Platform(1100, 200, 100, 20)
-    platform_list.add(plat6)
-
-    # Add all platforms to all_sprites group for drawing
-    all_sprites.add(platform_list)
-    
-    # --- Create enemies ---
-    enemy1 = Enemy(200, 280, 80) # On plat1
-    enemy_list.add(enemy1)
-    
-    enemy2 = Enemy(700, 280, 130) # On plat4
-    enemy_list.add(enemy2)
-    
-    all_sprites.add(enemy_list)
+    # Opt-in input recording (replay with replay.py)
+    record_path = os.environ.get("SAMSOFT_RECORD")
+    recorder = Recorder(level_spec_for(level_path), collision=world.collision) if record_path else None
+    save_state = None
 
     # --- Game Loop ---
+    # The world steps at a fixed FPS; frames render at the display's rate
+    # and draw the world interpolated between its last two steps.
+    render_fps = display_refresh_rate()
+    scheduler = FrameScheduler(render_fps)
+    step_seconds = 1.0 / FPS
+    accumulator = 0.0
+    last_time = time.perf_counter()
     running = True
     while running:
-        # Keep loop running at the right speed
-        clock.tick(FPS)
+        now = time.perf_counter()
+        accumulator += now - last_time
+        last_time = now
+        profiler.begin_frame()
         
         # --- Process Input (Events) ---
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.show_overlay = not profiler.show_overlay
+            # Save states: F5 saves, F9 loads
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                save_state = world.snapshot(save_state)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F9 and save_state is not None:
+                if recorder is not None:
+                    print("Save states are off while recording (the replay couldn't follow).")
+                else:
+                    world.restore(save_state)
+                    accumulator = 0.0
+        profiler.mark("events")
                 
         # --- Update ---
-        keys = pygame.key.get_pressed()
-        player.update(keys, platform_list, camera_x)
-        enemy_list.update()
-        
-        # --- Update Camera ---
-        # Tries to center player, but stops at level edges
-        target_camera_x = player.rect.x - SCREEN_WIDTH // 2
-        # Clamp camera to level bounds
-        if target_camera_x < 0:
-            camera_x = 0
-        elif target_camera_x > LEVEL_WIDTH - SCREEN_WIDTH:
-            camera_x = LEVEL_WIDTH - SCREEN_WIDTH
-        else:
-            camera_x = target_camera_x
-
-        # --- Check for Game Over Conditions ---
-        # Player falls off screen
-        if player.rect.top > SCREEN_HEIGHT:
-            player.reset(player_start_pos[0], player_start_pos[1])
-
-        # Check for collision with enemies
-        enemy_hit_list = pygame.sprite.spritecollide(player, enemy_list, False)
-        for hit_enemy in enemy_hit_list:
-            # Check if player landed on top of enemy (a simple stomp)
-            if player.vel_y > 0 and (player.rect.bottom < hit_enemy.rect.centery + 10):
-                hit_enemy.kill() # "Stomped" the enemy
-                player.vel_y = -JUMP_STRENGTH / 2 # Small bounce
-            else:
-                # Player was hit from the side or bottom
-                if player.take_damage(): # take_damage returns True if reset is needed
-                    player.reset(player_start_pos[0], player_start_pos[1])
+        # As many fixed steps as the elapsed time covers, at most MAX_SUBSTEPS
+        inputs = read_inputs(pygame.key.get_pressed())
+        steps = 0
+        while accumulator >= step_seconds and steps < MAX_SUBSTEPS:
+            if recorder is not None:
+                recorder.record(inputs)
+            world.step(inputs)
+            accumulator -= step_seconds
+            steps += 1
+        if accumulator >= step_seconds:
+            accumulator = 0.0 # Too far behind: drop the backlog and slow down
         
         # --- Draw / Render ---
-        screen.fill(SKY_BLUE)
-        
-        # Draw all sprites offset by the camera
-        for sprite in all_sprites:
-            # Simple flash effect for invincibility
-            if player.is_invincible and sprite == player:
-                if (pygame.time.get_ticks() // 100) % 2 == 0:
-                    # Draw nothing (skip)
-                    continue
-            
-            screen.blit(sprite.image, (sprite.rect.x - camera_x, sprite.rect.y))
+        # Simple flash effect for invincibility
+        hide_player = player.is_invincible and (pygame.time.get_ticks() // 100) % 2 == 0
+        draw_world(screen, world, static_layer, hide_player, accumulator / step_seconds)
+        if framebuffer is not None:
+            framebuffer.present()
+        profiler.draw_overlay(window)
+        profiler.mark("draw")
         
         # --- Flip the display ---
+        # Wait for the frame's deadline first, so frames come out at the render rate
+        scheduler.tick()
+        profiler.mark("frame.wait")
         pygame.display.flip()
+        profiler.mark("display.flip")
+        profiler.end_frame()
 
     # --- Quit ---
+    if profile_path:
+        profiler.dump_chrome_trace(profile_path)
+    if recorder is not None:
+        recorder.save(record_path, world.state_summary())
+    # Frame pacing; SAMSOFT_PACING=pacing.json also writes the full stats
+    # (frame-time histogram included) there
+    print(scheduler.report())
+    pacing_path = os.environ.get("SAMSOFT_PACING")
+    if pacing_path:
+        scheduler.dump_stats(pacing_path)
     pygame.quit()
     sys.exit()
 
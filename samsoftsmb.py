@@ -1,11 +1,24 @@
+import os
 import pygame
 import sys
 
+from engine import GRAVITY, JUMP_STRENGTH, PLAYER_SPEED, Enemy, PlatformGrid, fill_platforms
+from frame_scheduler import FrameScheduler
+from framebuffer import Framebuffer, parse_spec
+from particles import ParticleSystem
+from spatial_hash import SpatialHashGroup
+from surface_pool import SURFACE_POOL
+
 # --- Constants ---
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 400
 FPS = 60
 
+# Low-res mode: SAMSOFT_FRAMEBUFFER=240x160 (or 240x160x4 to pick the scale)
+# draws into a GBA-sized framebuffer upscaled to a window that many times
+# bigger, with a camera following the player around the screen-sized level.
+FRAMEBUFFER_SCALE = 3
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -15,19 +28,12 @@ GREEN = (0, 150, 0)       # Ground
 BROWN = (139, 69, 19)     # Enemy
 YELLOW = (255, 220, 0)    # "Coin" Block
 
-# Physics
-GRAVITY = 0.5
-JUMP_STRENGTH = -12
-PLAYER_SPEED = 5
-ENEMY_SPEED = 2
-
 # --- Player Class ---
 class Player(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
         # Use a simple rectangle for the player sprite
-        self.image = pygame.Surface((20, 30))
-        self.image.fill(RED)
+        self.image = SURFACE_POOL.solid((20, 30), RED)
         self.rect = self.image.get_rect()
         self.rect.topleft = (x, y)
         
@@ -35,6 +41,7 @@ class Player(pygame.sprite.Sprite):
         self.vel_x = 0
         self.vel_y = 0
         self.on_ground = False
+        self.particles = None # ParticleSystem for bonk effects, if any
 
     def update(self, keys, platforms):
         # Reset horizontal velocity
@@ -59,14 +66,18 @@ class Player(pygame.sprite.Sprite):
                 
         # --- Move and Check Collisions ---
         
+        # Broadphase: only platforms around where we can end up this frame
+        swept = self.rect.union(self.rect.move(self.vel_x, self.vel_y)).inflate(4, 4)
+        nearby = platforms.query(swept)
+        
         # Horizontal movement and collision
         self.rect.x += self.vel_x
-        self.check_collisions_x(platforms)
+        self.check_collisions_x(nearby)
         
         # Vertical movement and collision
         self.rect.y += self.vel_y
         self.on_ground = False # Assume not on ground until collision check
-        self.check_collisions_y(platforms)
+        self.check_collisions_y(nearby)
 
         # Keep player within screen bounds
         if self.rect.left < 0:
@@ -94,6 +105,10 @@ class Player(pygame.sprite.Sprite):
             elif self.vel_y < 0: # Moving up (jumping)
                 self.rect.top = platform.rect.bottom
                 self.vel_y = 0 # Bonk!
+                if self.particles is not None:
+                    self.particles.bonk(self.rect)
+                    if platform.color == YELLOW: # The "coin" block sparks
+                        self.particles.coin_block(platform.rect)
 
     def reset(self, x, y):
         """Called when player falls or is hit."""
@@ -102,85 +117,55 @@ class Player(pygame.sprite.Sprite):
         self.vel_y = 0
         self.on_ground = False
 
-# --- Enemy Class ---
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y, move_range):
-        super().__init__()
-        self.image = pygame.Surface((20, 20))
-        self.image.fill(BROWN)
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
-        
-        self.start_x = x
-        self.move_range = move_range
-        self.direction = ENEMY_SPEED
-
-    def update(self):
-        # Move back and forth
-        self.rect.x += self.direction
-        if self.rect.x > self.start_x + self.move_range or self.rect.x < self.start_x:
-            self.direction *= -1 # Turn around
-
-# --- Platform Class ---
-class Platform(pygame.sprite.Sprite):
-    def __init__(self, x, y, w, h, color=GREEN):
-        super().__init__()
-        self.image = pygame.Surface((w, h))
-        self.image.fill(color)
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x, y)
-
 # --- Main Game Function ---
 def main():
     pygame.init()
     
-    # Set up the display
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    # Set up the display (and the low-res framebuffer, if asked for)
+    framebuffer_spec = os.environ.get("SAMSOFT_FRAMEBUFFER")
+    if framebuffer_spec:
+        (view_width, view_height), scale = parse_spec(framebuffer_spec, FRAMEBUFFER_SCALE)
+        # The level is one screen: a framebuffer bigger than that is pointless
+        view_width, view_height = min(view_width, SCREEN_WIDTH), min(view_height, SCREEN_HEIGHT)
+        framebuffer = Framebuffer((view_width, view_height),
+                                  pygame.display.set_mode((view_width * scale, view_height * scale)))
+        screen = framebuffer.surface
+    else:
+        framebuffer = None
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("GBA-style Platformer Simulation")
-    clock = pygame.time.Clock()
+    scheduler = FrameScheduler(FPS)
 
     # --- Create Game Objects ---
     
-    # Sprite groups
-    all_sprites = pygame.sprite.Group()
-    platform_list = pygame.sprite.Group()
-    enemy_list = pygame.sprite.Group()
+    # Sprite groups; platforms are packed blocks, not sprites
+    platform_list = PlatformGrid()
+    enemy_list = SpatialHashGroup()
 
     # Create player
     player_start_pos = (50, 300)
     player = Player(player_start_pos[0], player_start_pos[1])
-    all_sprites.add(player)
+    particles = ParticleSystem()
+    player.particles = particles
     
     # Create platforms for a simple level
     # Ground
-    ground = Platform(0, SCREEN_HEIGHT - 40, SCREEN_WIDTH, 40)
-    platform_list.add(ground)
+    platform_list.add(0, SCREEN_HEIGHT - 40, SCREEN_WIDTH, 40)
     
     # Floating platforms
-    plat1 = Platform(200, 300, 100, 20)
-    platform_list.add(plat1)
-    
-    plat2 = Platform(350, 240, 80, 20)
-    platform_list.add(plat2)
+    platform_list.add(200, 300, 100, 20)
+    platform_list.add(350, 240, 80, 20)
     
     # "Coin" block
-    coin_block = Platform(150, 250, 30, 30, YELLOW)
-    platform_list.add(coin_block)
-
-    # Add all platforms to all_sprites group for drawing
-    all_sprites.add(platform_list)
+    platform_list.add(150, 250, 30, 30, YELLOW)
     
     # Create enemy
     enemy = Enemy(200, 280, 80) # x, y, move_range
     enemy_list.add(enemy)
-    all_sprites.add(enemy)
 
     # --- Game Loop ---
     running = True
     while running:
-        # Keep loop running at the right speed
-        clock.tick(FPS)
-        
         # --- Process Input (Events) ---
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -197,24 +182,41 @@ def main():
             player.reset(player_start_pos[0], player_start_pos[1])
 
         # Check for collision with enemies
-        enemy_hit_list = pygame.sprite.spritecollide(player, enemy_list, False)
+        enemy_hit_list = enemy_list.collide(player)
         for hit_enemy in enemy_hit_list:
             # Check if player landed on top of enemy (a simple stomp)
             if player.vel_y > 0 and (player.rect.bottom < hit_enemy.rect.centery):
                 hit_enemy.kill() # "Stomped" the enemy
+                particles.stomp(hit_enemy.rect)
                 player.vel_y = -JUMP_STRENGTH / 2 # Small bounce
             else:
                 # Player was hit from the side or bottom
                 player.reset(player_start_pos[0], player_start_pos[1])
+        particles.update()
         
         # --- Draw / Render ---
+        camera_x = camera_y = 0
+        if framebuffer is not None:
+            # Center the player, but stop at the level edges
+            camera_x = min(max(player.rect.centerx - view_width // 2, 0), SCREEN_WIDTH - view_width)
+            camera_y = min(max(player.rect.centery - view_height // 2, 0), SCREEN_HEIGHT - view_height)
+        # Player, then platforms, then enemies, then particles
         screen.fill(SKY_BLUE)
-        all_sprites.draw(screen) # Draw all sprites in the group
+        screen.blit(player.image, player.rect.move(-camera_x, -camera_y))
+        fill_platforms(screen, platform_list, camera_x, camera_y)
+        screen.blits([(sprite.image, sprite.rect.move(-camera_x, -camera_y))
+                      for sprite in enemy_list], False)
+        particles.draw(screen, camera_x, camera_y)
+        if framebuffer is not None:
+            framebuffer.present()
         
         # --- Flip the display ---
+        # Wait for the frame's deadline first, so frames come out evenly
+        scheduler.tick()
         pygame.display.flip()
 
     # --- Quit ---
+    print(scheduler.report())
     pygame.quit()
     sys.exit()
 
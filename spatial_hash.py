@@ -0,0 +1,101 @@
+import pygame
+
+# Default grid cell size in pixels. Roughly a couple of player widths, so a
+# swept player rect touches at most a handful of cells per frame.
+CELL_SIZE = 64
+
+
+# --- Spatial Hash Group ---
+class SpatialHashGroup(pygame.sprite.Group):
+    """A sprite group that also buckets its sprites into a uniform grid.
+
+    Works anywhere a normal Group does (drawing, update(), kill()), but
+    collision queries only look at the sprites in the cells a rect touches
+    instead of testing every sprite in the group. Sprites are hashed when
+    they are added and unhashed when they are removed or killed, so removing
+    a block only touches the cells it covered.
+    """
+
+    def __init__(self, *sprites, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}      # (cx, cy) -> {sprite: None}
+        self.cell_spans = {} # sprite -> (x0, y0, x1, y1) cell range it is in
+        self.order = {}      # sprite -> insertion number, keeps Group order
+        self.next_order = 0
+        super().__init__(*sprites)
+
+    def cell_span(self, rect):
+        """Return the (x0, y0, x1, y1) range of cells a rect covers."""
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.order[sprite] = self.next_order
+        self.next_order += 1
+        self._insert(sprite, self.cell_span(sprite.rect))
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self._discard(sprite)
+        del self.order[sprite]
+
+    def _insert(self, sprite, span):
+        x0, y0, x1, y1 = span
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    bucket = cells[(cx, cy)] = {}
+                bucket[sprite] = None
+        self.cell_spans[sprite] = span
+
+    def _discard(self, sprite):
+        x0, y0, x1, y1 = self.cell_spans.pop(sprite)
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells[(cx, cy)]
+                del bucket[sprite]
+                if not bucket:
+                    del cells[(cx, cy)]
+
+    def relocate(self, sprite):
+        """Re-bucket a sprite after its rect moved. Cheap if it stayed put."""
+        span = self.cell_span(sprite.rect)
+        if span != self.cell_spans[sprite]:
+            self._discard(sprite)
+            self._insert(sprite, span)
+
+    def update(self, *args, **kwargs):
+        """Update all sprites, then re-bucket the ones that changed cells."""
+        for sprite in self.sprites():
+            sprite.update(*args, **kwargs)
+            if sprite in self.cell_spans:
+                self.relocate(sprite)
+
+    def query(self, rect):
+        """Return the sprites whose cells overlap rect, in group order.
+
+        This is only the broadphase; the returned sprites may not actually
+        touch rect. Pass the result to pygame.sprite.spritecollide() or use
+        collide() for the exact test.
+        """
+        x0, y0, x1, y1 = self.cell_span(rect)
+        cells = self.cells
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        if len(found) > 1:
+            return sorted(found, key=self.order.__getitem__)
+        return list(found)
+
+    def collide(self, sprite):
+        """Same result as pygame.sprite.spritecollide(sprite, self, False)."""
+        colliderect = sprite.rect.colliderect
+        return [s for s in self.query(sprite.rect) if colliderect(s.rect)]
@@ -0,0 +1,94 @@
+import pygame
+
+# Width of one pre-rendered chunk in pixels
+CHUNK_WIDTH = 256
+
+
+# --- Static Layer Cache ---
+class StaticLayer:
+    """Pre-rendered background + platforms, cut into fixed-width chunks.
+
+    Platforms never move, so instead of filling the sky and blitting every
+    platform each frame we bake them once into chunk surfaces and blit only
+    the few chunks under the camera. Chunks are baked lazily the first time
+    they are seen and the ones farthest from the camera are dropped past
+    max_chunks, so memory stays flat on long levels.
+
+    A platform whose look changes (e.g. a coin block going GRAY) sets
+    `dirty = 1`; the next draw() re-bakes only the chunks it covers. An
+    area that changed with no block there to flag (a streamed level's
+    chunk loaded back in) goes into the grid's `dirty_rects` instead.
+    """
+
+    def __init__(self, platforms, level_width, height, background,
+                 chunk_width=CHUNK_WIDTH, max_chunks=16):
+        self.platforms = platforms # a PlatformGrid or TileGrid
+        self.level_width = level_width
+        self.height = height
+        self.background = background
+        self.chunk_width = chunk_width
+        self.max_chunks = max_chunks
+        self.chunks = {} # chunk index -> baked Surface
+
+    def bake(self, index):
+        """Render chunk `index` from scratch and cache it."""
+        x0 = index * self.chunk_width
+        width = min(self.chunk_width, self.level_width - x0)
+        chunk = pygame.Surface((width, self.height))
+        if pygame.display.get_surface() is not None:
+            chunk = chunk.convert()
+        chunk.fill(self.background)
+
+        area = pygame.Rect(x0, 0, width, self.height)
+        bounds = chunk.get_rect()
+        for sprite in self.platforms.query(area):
+            color = getattr(sprite, "color", None)
+            if color is not None: # Solid platform: a fill, no surface needed
+                # Clip first: fill() overshoots rects hanging off the left edge
+                chunk.fill(color, sprite.rect.move(-x0, 0).clip(bounds))
+            else:
+                chunk.blit(sprite.image, (sprite.rect.x - x0, sprite.rect.y))
+        self.chunks[index] = chunk
+        return chunk
+
+    def invalidate(self, rect):
+        """Forget every baked chunk that overlaps rect."""
+        first = max(rect.left // self.chunk_width, 0)
+        last = (rect.right - 1) // self.chunk_width
+        for index in range(first, last + 1):
+            self.chunks.pop(index, None)
+
+    def draw(self, screen, camera_x, camera_y=0):
+        """Blit the chunks covering [camera_x, camera_x + screen width).
+
+        camera_y scrolls the chunks up on screens shorter than the level.
+        """
+        view = pygame.Rect(camera_x, 0, screen.get_width(), self.height)
+
+        # Re-bake around any platform or area that changed since the last frame
+        dirty_rects = getattr(self.platforms, "dirty_rects", None)
+        if dirty_rects:
+            for rect in dirty_rects:
+                self.invalidate(pygame.Rect(rect))
+            dirty_rects.clear()
+        for sprite in self.platforms.query(view):
+            if getattr(sprite, "dirty", 0):
+                self.invalidate(sprite.rect)
+                sprite.dirty = 0
+
+        first = max(view.left // self.chunk_width, 0)
+        last = min((view.right - 1) // self.chunk_width,
+                   (self.level_width - 1) // self.chunk_width)
+        batch = []
+        for index in range(first, last + 1):
+            chunk = self.chunks.get(index)
+            if chunk is None:
+                chunk = self.bake(index)
+            batch.append((chunk, (index * self.chunk_width - camera_x, -camera_y)))
+        screen.blits(batch, False)
+
+        # Drop the chunks farthest from the camera
+        if len(self.chunks) > self.max_chunks:
+            center = (first + last) / 2
+            for index in sorted(self.chunks, key=lambda i: abs(i - center))[self.max_chunks:]:
+                del self.chunks[index]
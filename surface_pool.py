@@ -0,0 +1,31 @@
+import pygame
+
+
+# --- Surface Pool ---
+class SurfacePool:
+    """Shares solid-color surfaces between sprites.
+
+    solid(size, color) returns the same Surface for every caller asking for
+    the same (size, color), converted to the display's pixel format when a
+    display is up. Pooled surfaces are shared, so never draw on or fill
+    them: to change how one sprite looks, give it a different pooled
+    surface instead.
+    """
+
+    def __init__(self):
+        self.surfaces = {} # (size, color) -> Surface
+
+    def solid(self, size, color):
+        key = (tuple(size), tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = pygame.Surface(key[0])
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            surface.fill(key[1])
+            self.surfaces[key] = surface
+        return surface
+
+
+# Shared by both games
+SURFACE_POOL = SurfacePool()
@@ -0,0 +1,53 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pytest
+
+import samsofthdr as hdr
+from level_stream import TILE_COIN_BLOCK, LevelFile, generate_level
+from static_layer import StaticLayer
+
+
+@pytest.fixture
+def level(tmp_path):
+    path = str(tmp_path / "level.lvl")
+    generate_level(path, 20000, seed=3)
+    level = LevelFile(path)
+    yield level
+    level.close()
+
+
+@pytest.mark.parametrize("collision", hdr.COLLISION_MODES)
+def test_restore_rebakes_block_from_evicted_chunk(level, collision):
+    """A coin block used after a save, then streamed out, is yellow again
+    once the save is restored."""
+    pygame.init()
+    world = hdr.World(level, collision=collision)
+    screen = pygame.Surface((hdr.SCREEN_WIDTH, hdr.SCREEN_HEIGHT))
+    layer = StaticLayer(world.platform_list, world.level_width, hdr.SCREEN_HEIGHT, hdr.SKY_BLUE)
+    size = level.tile_size
+    corner = next((col * size, row * size) for col, row in level.positions(TILE_COIN_BLOCK)
+                  if col * size < world.camera_x + hdr.SCREEN_WIDTH - size)
+
+    def block_color():
+        x, y = corner
+        return tuple(screen.get_at((x - world.camera_x + 2, y - world.camera_y + 2)))[:3]
+
+    saved = bytes(world.snapshot())
+    world.set_used_corners({corner}) # As a head bonk does
+    hdr.draw_world(screen, world, layer)
+    assert block_color() == hdr.GRAY
+
+    # Walk away until the block's chunk is evicted
+    world.player.rect.x += 1750
+    for _ in range(2): # The camera moves, then the chunks follow
+        world.step(0)
+    hdr.draw_world(screen, world, layer)
+    assert corner[0] // level.chunk_px not in world.loaded_chunks
+
+    world.restore(bytearray(saved))
+    assert world.used_blocks() == []
+    hdr.draw_world(screen, world, layer)
+    assert block_color() == hdr.YELLOW
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+
+
+# --- Text Layout Cache ---
+class TextCache:
+    """Memoizes word-wrapped line breaks and the rendered line surfaces.
+
+    Layouts are keyed by (text, font, max_width) and rendered lines by
+    (text, font, color, max_width), so static text costs one dict lookup per
+    frame instead of a font.size() per word and a font.render() per line.
+    The least recently used entries are dropped past max_entries.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.layouts = OrderedDict()  # (text, font, max_width) -> [line, ...]
+        self.rendered = OrderedDict() # (text, font, color, max_width) -> [Surface, ...]
+
+    def _remember(self, table, key, value):
+        table[key] = value
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+        return value
+
+    def layout(self, text, font, max_width):
+        """Return the wrapped lines of text (same breaks as draw_text always had)."""
+        key = (text, font, max_width)
+        lines = self.layouts.get(key)
+        if lines is not None:
+            self.layouts.move_to_end(key)
+            return lines
+
+        if max_width is None: # No wrapping
+            return self._remember(self.layouts, key, [text])
+
+        words = text.split(' ')
+        lines = []
+        current_line = ""
+
+        for word in words:
+            test_line = current_line + word + " "
+            if font.size(test_line)[0] <= max_width:
+                current_line = test_line
+            else:
+                lines.append(current_line)
+                current_line = word + " "
+
+        lines.append(current_line)
+        return self._remember(self.layouts, key, lines)
+
+    def render_lines(self, text, font, color, max_width):
+        """Return one rendered Surface per wrapped line (max_width None: no wrap)."""
+        key = (text, font, color, max_width)
+        surfaces = self.rendered.get(key)
+        if surfaces is not None:
+            self.rendered.move_to_end(key)
+            return surfaces
+        surfaces = [font.render(line, True, color)
+                    for line in self.layout(text, font, max_width)]
+        return self._remember(self.rendered, key, surfaces)
+
+    def render(self, text, font, color):
+        """Return a single unwrapped line, rendered once."""
+        return self.render_lines(text, font, color, None)[0]
+
+    def draw(self, surface, text, pos, font, color, max_width):
+        """Blit wrapped text at pos from the cache."""
+        x, y = pos
+        line_height = font.get_linesize()
+        batch = []
+        for line_surface in self.render_lines(text, font, color, max_width):
+            batch.append((line_surface, (x, y)))
+            y += line_height
+        surface.blits(batch, False)
+
+    def clear(self):
+        self.layouts.clear()
+        self.rendered.clear()
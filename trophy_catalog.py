@@ -0,0 +1,301 @@
+"""Trophy catalog: an SQLite file with a full-text index over the trophies.
+
+    python trophy_catalog.py generate trophies.db --count 5000
+    python trophy_catalog.py search trophies.db "cape feather"
+    python programhdrcapev0.py trophies.db
+
+Tables:
+
+    trophies       id, title, game, description, art (JSON drawing, see render_art)
+    trophy_search  FTS5 index over title, game and description
+
+Browsing only reads the ids in title order; a trophy's description and art
+are read when it is first shown (or prefetched). Searching uses the FTS5
+index when SQLite has it and a LIKE scan otherwise.
+"""
+import argparse
+import json
+import queue
+import random
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+
+import pygame
+
+Trophy = namedtuple("Trophy", "id title game description art")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trophies (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    game TEXT NOT NULL,
+    description TEXT NOT NULL,
+    art TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trophies_by_title ON trophies (title, id);
+"""
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS trophy_search USING fts5(
+    title, game, description, content='trophies', content_rowid='id'
+);
+"""
+
+
+# --- Art ---
+# Art is a JSON object: {"size": [w, h], "shapes": [shape, ...]} where a
+# shape is one of
+#     ["polygon", color, [[x, y], ...]]
+#     ["line", color, [x1, y1], [x2, y2], width]
+#     ["circle", color, [x, y], radius]
+def render_art(art, scale=1):
+    """Draw an art description onto a new transparent surface.
+
+    The art is vector data, so scale > 1 draws it bigger at full detail.
+    """
+    if isinstance(art, str):
+        art = json.loads(art)
+    def point(p):
+        return (round(p[0] * scale), round(p[1] * scale))
+    width, height = point(art["size"])
+    surface = pygame.Surface((width, height), pygame.SRCALPHA)
+    for shape in art["shapes"]:
+        kind, color = shape[0], shape[1]
+        if kind == "polygon":
+            pygame.draw.polygon(surface, color, [point(p) for p in shape[2]])
+        elif kind == "line":
+            pygame.draw.line(surface, color, point(shape[2]), point(shape[3]), max(round(shape[4] * scale), 1))
+        elif kind == "circle":
+            pygame.draw.circle(surface, color, point(shape[2]), max(round(shape[3] * scale), 1))
+        else:
+            raise ValueError("unknown art shape %r" % kind)
+    return surface
+
+
+# --- Writing ---
+def has_fts5(connection):
+    try:
+        connection.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        connection.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def write_catalog(path, trophies):
+    """Create (or add to) a catalog from (title, game, description, art) tuples.
+
+    art may be a dict or its JSON string.
+    """
+    connection = sqlite3.connect(path)
+    _write(connection, trophies)
+    connection.close()
+
+
+def _write(connection, trophies):
+    with connection:
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "INSERT INTO trophies (title, game, description, art) VALUES (?, ?, ?, ?)",
+            ((title, game, description, art if isinstance(art, str) else json.dumps(art))
+             for title, game, description, art in trophies))
+        if has_fts5(connection):
+            connection.executescript(FTS_SCHEMA)
+            connection.execute("INSERT INTO trophy_search (trophy_search) VALUES ('rebuild')")
+
+
+GAMES = ("Super Mario World", "Super Mario Bros.", "The Legend of Zelda", "Metroid",
+         "Kirby's Dream Land", "Star Fox", "F-Zero", "EarthBound", "Pikmin", "Yoshi's Island")
+ADJECTIVES = ("Cape", "Golden", "Spiny", "Frozen", "Mystic", "Ancient", "Turbo", "Shadow",
+              "Crystal", "Thunder", "Lucky", "Giant", "Tiny", "Royal", "Rusty", "Cosmic")
+NOUNS = ("Feather", "Shell", "Mushroom", "Star", "Flower", "Hammer", "Boots", "Crown",
+         "Key", "Orb", "Shield", "Bell", "Lantern", "Banner", "Compass", "Egg")
+WORDS = ("this", "item", "first", "appeared", "grants", "power", "its", "holder", "can",
+         "fly", "jump", "higher", "glow", "spin", "attack", "collect", "coins", "legend",
+         "says", "hero", "once", "carried", "across", "the", "kingdom", "while", "rivals",
+         "tried", "to", "steal", "it", "during", "battle", "a", "well-timed", "swing")
+
+
+def random_art(rnd, width=100, height=200):
+    """A few stacked colored shapes, roughly trophy shaped."""
+    def color():
+        return [rnd.randrange(60, 256), rnd.randrange(60, 256), rnd.randrange(60, 256)]
+    cx = width // 2
+    shapes = [["polygon", color(), [[cx, 10], [width - 10, height // 3],
+                                    [cx + rnd.randrange(10, 40), height - 40],
+                                    [cx - rnd.randrange(10, 40), height - 40],
+                                    [10, height // 3]]]]
+    for _ in range(rnd.randrange(1, 4)):
+        shapes.append(["circle", color(), [rnd.randrange(20, width - 20), rnd.randrange(30, height - 60)],
+                       rnd.randrange(5, 20)])
+    shapes.append(["polygon", color(), [[cx - 30, height - 40], [cx + 30, height - 40],
+                                        [cx + 20, height - 10], [cx - 20, height - 10]]])
+    return {"size": [width, height], "shapes": shapes}
+
+
+def generate_catalog(path, count, seed=0):
+    """Write a catalog of count made-up trophies (for testing big catalogs)."""
+    rnd = random.Random(seed)
+    def trophies():
+        for i in range(count):
+            title = "%s %s" % (rnd.choice(ADJECTIVES), rnd.choice(NOUNS))
+            if i >= len(ADJECTIVES) * len(NOUNS):
+                title += " %d" % (i // (len(ADJECTIVES) * len(NOUNS)) + 1)
+            words = [rnd.choice(WORDS) for _ in range(rnd.randrange(30, 60))]
+            description = " ".join(words).capitalize() + "."
+            yield title, "Appears in: " + rnd.choice(GAMES), description, random_art(rnd)
+    write_catalog(path, trophies())
+
+
+# --- Reading ---
+class TrophyCatalog:
+    """Read access to a catalog file, safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self._check_fts()
+
+    @classmethod
+    def from_trophies(cls, trophies):
+        """An in-memory catalog holding (title, game, description, art) tuples."""
+        catalog = cls(":memory:")
+        _write(catalog.connection, trophies)
+        catalog._check_fts()
+        return catalog
+
+    def _check_fts(self):
+        with self.lock:
+            tables = {name for (name,) in self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.fts = "trophy_search" in tables
+
+    def close(self):
+        self.connection.close()
+
+    def ids(self):
+        """Every trophy id in browsing (title) order."""
+        with self.lock:
+            return [row[0] for row in self.connection.execute(
+                "SELECT id FROM trophies ORDER BY title, id")]
+
+    def get(self, trophy_id):
+        """Load one full trophy (a primary key lookup)."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT id, title, game, description, art FROM trophies WHERE id = ?",
+                (trophy_id,)).fetchone()
+        if row is None:
+            raise KeyError(trophy_id)
+        return Trophy(*row)
+
+    def search(self, text, limit=1000):
+        """Ids of the trophies matching every word of text.
+
+        Words match as prefixes ("feath" finds "Feather"). At most limit ids
+        come back. With the FTS5 index they come best match first, unless
+        the query matches more than limit (a single letter, say): that isn't
+        worth ranking, so it returns the first limit matches in title order
+        instead. Without FTS5 (a LIKE scan) nothing is ranked and the first
+        limit matches always come in title order.
+        """
+        words = text.split()
+        if not words:
+            return self.ids()
+        connection = self.connection
+        with self.lock:
+            if self.fts:
+                query = " ".join('"%s"*' % word.replace('"', '""') for word in words)
+                count = len(connection.execute(
+                    "SELECT rowid FROM trophy_search WHERE trophy_search MATCH ? LIMIT ?",
+                    (query, limit + 1)).fetchall())
+                if count <= limit:
+                    return [row[0] for row in connection.execute(
+                        "SELECT rowid FROM trophy_search WHERE trophy_search MATCH ? ORDER BY rank",
+                        (query,))]
+                return [row[0] for row in connection.execute(
+                    "SELECT trophies.id FROM trophy_search"
+                    " JOIN trophies ON trophies.id = trophy_search.rowid"
+                    " WHERE trophy_search MATCH ? ORDER BY trophies.title, trophies.id LIMIT ?",
+                    (query, limit))]
+            where = " AND ".join(["(title || ' ' || game || ' ' || description) LIKE ?"] * len(words))
+            return [row[0] for row in connection.execute(
+                "SELECT id FROM trophies WHERE %s ORDER BY title, id LIMIT ?" % where,
+                ["%" + word + "%" for word in words] + [limit])]
+
+
+# --- Lazy Loading ---
+class TrophyLoader:
+    """Loads and prepares trophies on demand, prefetching on a background thread.
+
+    prepare(trophy) turns a catalog row into whatever the viewer draws
+    (art surface, rotation cache, ...). get() returns a prepared trophy,
+    preparing it on the spot if the prefetcher hasn't got to it;
+    prefetch(ids) queues trophies the viewer is likely to show next. The
+    `capacity` most recently used prepared trophies are kept.
+    """
+
+    def __init__(self, catalog, prepare, capacity=8):
+        self.catalog = catalog
+        self.prepare = prepare
+        self.capacity = capacity
+        self.prepared = OrderedDict() # id -> prepared trophy
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _load(self, trophy_id):
+        with self.lock:
+            item = self.prepared.get(trophy_id)
+            if item is not None:
+                self.prepared.move_to_end(trophy_id)
+                return item
+        item = self.prepare(self.catalog.get(trophy_id))
+        with self.lock:
+            item = self.prepared.setdefault(trophy_id, item)
+            self.prepared.move_to_end(trophy_id)
+            while len(self.prepared) > self.capacity:
+                self.prepared.popitem(last=False)
+        return item
+
+    def get(self, trophy_id):
+        return self._load(trophy_id)
+
+    def prefetch(self, ids):
+        """Prepare ids in the background (newer requests replace older ones)."""
+        self.requests.put(list(ids))
+
+    def _run(self):
+        while True:
+            ids = self.requests.get()
+            while not self.requests.empty(): # Only the latest request matters
+                ids = self.requests.get()
+            for trophy_id in ids:
+                self._load(trophy_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or search a trophy catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="write a catalog of made-up trophies")
+    generate.add_argument("path")
+    generate.add_argument("--count", type=int, default=5000)
+    generate.add_argument("--seed", type=int, default=0)
+    search = commands.add_parser("search", help="print the trophies matching a query")
+    search.add_argument("path")
+    search.add_argument("query")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_catalog(args.path, args.count, args.seed)
+    else:
+        catalog = TrophyCatalog(args.path)
+        for trophy_id in catalog.search(args.query)[:20]:
+            trophy = catalog.get(trophy_id)
+            print("%6d  %-28s %s" % (trophy.id, trophy.title, trophy.game))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Render trophy turntables offline, in parallel, with no window.
+
+    python turntable_render.py --frames 120 --size 1920x1080
+    python turntable_render.py --catalog trophies.db --trophy "cape feather" --trophy shell
+    python turntable_render.py --pipe "ffmpeg -y -f rawvideo -pix_fmt rgb24 -s {size} -r {fps} -i - {trophy}.mp4"
+    python turntable_render.py --raw - | ffmpeg -f rawvideo -pix_fmt rgb24 -s 600x400 -i - out.mp4
+
+Each trophy gets one full turn (the viewer's cos squash and flip) while it
+bobs on the viewer's sine wave, so the clip loops seamlessly. The art is
+drawn at the output resolution, not upscaled. Frames are split across a
+process pool: PNG frames are written by the workers themselves, raw frames
+come back to this process and are streamed to the encoder in order, at
+most a few frames per worker ahead.
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import programhdrcapev0 as viewer
+from trophy_catalog import TrophyCatalog, render_art
+
+# Frames each worker may have in flight ahead of the ordered writer
+FRAMES_AHEAD = 4
+
+
+def render_frame(source, frame, frames, size, scale, bob_cycles=1, background=viewer.BACKGROUND_COLOR):
+    """Frame `frame` of a `frames`-long turntable of source, centered in size.
+
+    background None leaves the frame transparent.
+    """
+    turn = frame / frames
+    surface = pygame.Surface(size, pygame.SRCALPHA if background is None else 0)
+    if background is not None:
+        surface.fill(background)
+    scaled_surface = viewer.render_rotation_frame(source, 2 * math.pi * turn)
+    if scaled_surface is not None:
+        y_offset = viewer.float_offset(2 * math.pi * turn * bob_cycles, viewer.FLOAT_AMPLITUDE * scale)
+        surface.blit(scaled_surface, scaled_surface.get_rect(
+            center=(size[0] / 2, size[1] / 2 + y_offset)))
+    return surface
+
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+# --- Worker side ---
+_worker = {}
+
+
+def _init_worker(arts, frames, size, bob_cycles, transparent):
+    pygame.init()
+    # Art is drawn at the output resolution: viewer height -> output height
+    scale = size[1] / viewer.SCREEN_HEIGHT
+    _worker.update(
+        sources={}, arts=arts, frames=frames, size=size, scale=scale,
+        bob_cycles=bob_cycles, background=None if transparent else viewer.BACKGROUND_COLOR,
+    )
+
+
+def _render(trophy, frame):
+    sources = _worker["sources"]
+    source = sources.get(trophy)
+    if source is None:
+        source = sources[trophy] = render_art(_worker["arts"][trophy], _worker["scale"])
+    return render_frame(source, frame, _worker["frames"], _worker["size"],
+                        _worker["scale"], _worker["bob_cycles"], _worker["background"])
+
+
+def render_png(trophy, frame, path):
+    pygame.image.save(_render(trophy, frame), path)
+    return path
+
+
+def render_raw(trophy, frame):
+    return pygame.image.tobytes(_render(trophy, frame), "RGB")
+
+
+# --- Parent side ---
+def ordered(pool, calls, window):
+    """Yield the results of calls [(fn, args), ...] in order.
+
+    At most window calls are in flight, so a slow writer holds back the
+    workers instead of piling up frames in memory.
+    """
+    pending = deque()
+    calls = iter(calls)
+    for fn, args in calls:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def load_trophies(catalog_path, queries, limit):
+    """Return [(name, art)] for the trophies to render."""
+    if catalog_path is None:
+        return [(slug(viewer.TROPHY_TITLE), viewer.feather_art(viewer.FEATHER_BASE_WIDTH,
+                                                                viewer.FEATHER_BASE_HEIGHT))]
+    catalog = TrophyCatalog(catalog_path)
+    ids = []
+    for query in queries or [""]:
+        ids.extend(trophy_id for trophy_id in catalog.search(query)[:limit] if trophy_id not in ids)
+    trophies = []
+    for trophy_id in ids[:limit]:
+        trophy = catalog.get(trophy_id)
+        trophies.append(("%d_%s" % (trophy.id, slug(trophy.title)), trophy.art))
+    catalog.close()
+    return trophies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render trophy turntables to PNG frames or an encoder.")
+    parser.add_argument("--catalog", help="trophy catalog (default: the built-in Cape Feather)")
+    parser.add_argument("--trophy", action="append",
+                        help="catalog search for the trophies to render (repeatable; default: all)")
+    parser.add_argument("--limit", type=int, default=10, help="most trophies to render")
+    parser.add_argument("--frames", type=int, default=120, help="frames per full turn")
+    parser.add_argument("--size", default="%dx%d" % (viewer.SCREEN_WIDTH, viewer.SCREEN_HEIGHT))
+    parser.add_argument("--bob-cycles", type=int, default=1, help="bobs per turn")
+    parser.add_argument("--fps", type=int, default=60, help="frame rate passed to --pipe")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--png", default="turntable/{trophy}_{frame:04d}.png",
+                        help="PNG path pattern ({trophy}, {frame})")
+    output.add_argument("--pipe", help="encoder command reading rgb24 frames on stdin, "
+                                       "started once per trophy ({trophy}, {size}, {fps})")
+    output.add_argument("--raw", help="write rgb24 frames of every trophy here, - for stdout")
+    parser.add_argument("--transparent", action="store_true", help="PNG frames with alpha, no background")
+    args = parser.parse_args()
+
+    size = tuple(int(n) for n in args.size.lower().split("x"))
+    trophies = load_trophies(args.catalog, args.trophy, args.limit)
+    arts = [art for _, art in trophies]
+    window = args.workers * FRAMES_AHEAD
+
+    start = time.perf_counter()
+    # Spawned, not forked: a forked worker would keep a copy of the encoder's
+    # stdin open and the encoder would never see the end of its input
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(arts, args.frames, size, args.bob_cycles,
+                                       args.transparent and not (args.pipe or args.raw))) as pool:
+        if args.pipe or args.raw:
+            raw = None
+            if args.raw:
+                raw = sys.stdout.buffer if args.raw == "-" else open(args.raw, "wb")
+            for index, (name, _) in enumerate(trophies):
+                encoder = None
+                out = raw
+                if args.pipe:
+                    command = args.pipe.format(trophy=name, size="%dx%d" % size, fps=args.fps)
+                    encoder = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+                    out = encoder.stdin
+                for data in ordered(pool, ((render_raw, (index, frame)) for frame in range(args.frames)),
+                                    window):
+                    out.write(data)
+                if encoder is not None:
+                    encoder.stdin.close()
+                    if encoder.wait():
+                        sys.exit("encoder failed for %s" % name)
+            if raw is not None and raw is not sys.stdout.buffer:
+                raw.close()
+        else:
+            calls = []
+            for index, (name, _) in enumerate(trophies):
+                for frame in range(args.frames):
+                    path = args.png.format(trophy=name, frame=frame)
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    calls.append((render_png, (index, frame, path)))
+            for _ in ordered(pool, calls, window):
+                pass
+    elapsed = time.perf_counter() - start
+
+    total = len(trophies) * args.frames
+    print("%d frames (%d trophies) at %dx%d in %.2fs: %.1f frames/sec with %d workers"
+          % (total, len(trophies), size[0], size[1], elapsed, total / elapsed if elapsed else 0, args.workers),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()